@@ -1,17 +1,40 @@
 from . import parser
 from .parser import (
-    HTTPProtocol,
     HttpRequestParser,
     HttpResponseParser,
+    parse_request_head,
+    FEED_OK,
+    FEED_PAUSED,
+    FEED_UPGRADE,
+    FEED_ERROR,
     HttpParserError,
     HttpParserCallbackError,
     HttpParserInvalidStatusError,
     HttpParserInvalidMethodError,
     HttpParserInvalidURLError,
+    HttpParserInvalidHeaderError,
     HttpParserUpgrade,
-    parse_url,
+    HttpParserIncomplete,
+    HttpParserDecodingError,
+    HttpParserMultipartError,
+    HttpParserWebSocketError,
 )
 
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from .parser import (
+        HTTPProtocol,
+        parse_url,
+        parse_cookie,
+        parse_content_type,
+        parse_accept,
+        parse_host,
+        Router,
+        MultipartParser,
+        WebSocketFrameParser,
+    )
+
 from ._version import __version__
 
 __all__ = (
@@ -21,15 +44,51 @@ __all__ = (
     # parser
     "HttpRequestParser",
     "HttpResponseParser",
+    "parse_request_head",
+    "FEED_OK",
+    "FEED_PAUSED",
+    "FEED_UPGRADE",
+    "FEED_ERROR",
     # errors
     "HttpParserError",
     "HttpParserCallbackError",
     "HttpParserInvalidStatusError",
     "HttpParserInvalidMethodError",
     "HttpParserInvalidURLError",
+    "HttpParserInvalidHeaderError",
     "HttpParserUpgrade",
+    "HttpParserIncomplete",
+    "HttpParserDecodingError",
+    "HttpParserMultipartError",
+    "HttpParserWebSocketError",
     # url parser
     "parse_url",
+    # header parsers
+    "parse_cookie",
+    "parse_content_type",
+    "parse_accept",
+    "parse_host",
+    # router
+    "Router",
+    # multipart
+    "MultipartParser",
+    # websocket
+    "WebSocketFrameParser",
     # version
     "__version__",
 )
+
+
+def __getattr__(name: str) -> object:
+    # Rarely used names are loaded lazily by httptools.parser; the
+    # others are already in the module globals.
+    if name in __all__:
+        value = getattr(parser, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__() -> "list[str]":
+    return sorted(set(globals()) | set(__all__))
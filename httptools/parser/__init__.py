@@ -1,14 +1,70 @@
-from .protocol import HTTPProtocol
-from .parser import HttpRequestParser, HttpResponseParser  # NoQA
+TYPE_CHECKING = False
+
+from .parser import (  # NoQA
+    HttpRequestParser,
+    HttpResponseParser,
+    parse_request_head,
+    FEED_OK,
+    FEED_PAUSED,
+    FEED_UPGRADE,
+    FEED_ERROR,
+)
 from .errors import (
     HttpParserError,
     HttpParserCallbackError,
     HttpParserInvalidStatusError,
     HttpParserInvalidMethodError,
     HttpParserInvalidURLError,
+    HttpParserInvalidHeaderError,
     HttpParserUpgrade,
+    HttpParserIncomplete,
+    HttpParserDecodingError,
+    HttpParserMultipartError,
+    HttpParserWebSocketError,
 )
-from .url_parser import parse_url
+
+if TYPE_CHECKING:
+    from .protocol import HTTPProtocol
+    from .url_parser import parse_url
+    from .header_parser import (
+        parse_cookie,
+        parse_content_type,
+        parse_accept,
+        parse_host,
+    )
+    from .router import Router
+    from .multipart import MultipartParser
+    from .websocket import WebSocketFrameParser
+
+# Everything not needed to parse messages is imported on first access,
+# to keep "import httptools" cheap.
+_LAZY = {
+    "HTTPProtocol": "protocol",
+    "parse_url": "url_parser",
+    "parse_cookie": "header_parser",
+    "parse_content_type": "header_parser",
+    "parse_accept": "header_parser",
+    "parse_host": "header_parser",
+    "Router": "router",
+    "MultipartParser": "multipart",
+    "WebSocketFrameParser": "websocket",
+}
+
+
+def __getattr__(name: str) -> object:
+    modname = _LAZY.get(name)
+    if modname is None:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    from importlib import import_module
+    value = getattr(import_module("." + modname, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> "list[str]":
+    return sorted(set(globals()) | set(_LAZY))
+
 
 __all__ = (
     # protocol
@@ -16,13 +72,34 @@ __all__ = (
     # parser
     "HttpRequestParser",
     "HttpResponseParser",
+    "parse_request_head",
+    "FEED_OK",
+    "FEED_PAUSED",
+    "FEED_UPGRADE",
+    "FEED_ERROR",
     # errors
     "HttpParserError",
     "HttpParserCallbackError",
     "HttpParserInvalidStatusError",
     "HttpParserInvalidMethodError",
     "HttpParserInvalidURLError",
+    "HttpParserInvalidHeaderError",
     "HttpParserUpgrade",
+    "HttpParserIncomplete",
+    "HttpParserDecodingError",
+    "HttpParserMultipartError",
+    "HttpParserWebSocketError",
     # url_parser
     "parse_url",
+    # header_parser
+    "parse_cookie",
+    "parse_content_type",
+    "parse_accept",
+    "parse_host",
+    # router
+    "Router",
+    # multipart
+    "MultipartParser",
+    # websocket
+    "WebSocketFrameParser",
 )
@@ -50,6 +50,11 @@ cdef extern from "llhttp.h":
         HTTP_RESPONSE
     ctypedef llhttp_type llhttp_type_t
 
+    ctypedef enum llhttp_finish_t:
+        HTTP_FINISH_SAFE,
+        HTTP_FINISH_SAFE_WITH_CB,
+        HTTP_FINISH_UNSAFE
+
     enum llhttp_errno:
         HPE_OK,
         HPE_INTERNAL,
@@ -145,6 +150,9 @@ cdef extern from "llhttp.h":
 
     llhttp_errno_t llhttp_execute(llhttp_t* parser, const char* data, size_t len)
 
+    llhttp_errno_t llhttp_finish(llhttp_t* parser)
+
+    void llhttp_resume(llhttp_t* parser)
     void llhttp_resume_after_upgrade(llhttp_t* parser)
 
     int llhttp_should_keep_alive(const llhttp_t* parser)
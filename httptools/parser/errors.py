@@ -3,7 +3,12 @@ __all__ = ('HttpParserError',
            'HttpParserInvalidStatusError',
            'HttpParserInvalidMethodError',
            'HttpParserInvalidURLError',
-           'HttpParserUpgrade')
+           'HttpParserInvalidHeaderError',
+           'HttpParserUpgrade',
+           'HttpParserIncomplete',
+           'HttpParserDecodingError',
+           'HttpParserMultipartError',
+           'HttpParserWebSocketError')
 
 
 class HttpParserError(Exception):
@@ -26,5 +31,25 @@ class HttpParserInvalidURLError(HttpParserError):
     pass
 
 
+class HttpParserInvalidHeaderError(HttpParserError):
+    pass
+
+
+class HttpParserDecodingError(HttpParserError):
+    pass
+
+
+class HttpParserMultipartError(HttpParserError):
+    pass
+
+
+class HttpParserWebSocketError(HttpParserError):
+    pass
+
+
 class HttpParserUpgrade(Exception):
     pass
+
+
+class HttpParserIncomplete(Exception):
+    pass
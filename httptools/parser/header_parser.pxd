@@ -0,0 +1,4 @@
+cdef dict cookies_from_bytes(const char* at, size_t length)
+cdef tuple content_type_from_bytes(const char* at, size_t length)
+cdef list accept_from_bytes(const char* at, size_t length)
+cdef tuple host_from_bytes(const char* at, size_t length)
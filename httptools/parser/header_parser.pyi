@@ -0,0 +1,32 @@
+from array import array
+
+_Buffer = bytes | bytearray | memoryview | array[int]
+
+def parse_cookie(data: _Buffer) -> dict[bytes, bytes]:
+    """Parse a Cookie header value into a dict of cookie names to values.
+
+    If a name is repeated, the first value is kept.
+    """
+
+def parse_content_type(data: _Buffer) -> tuple[bytes, dict[bytes, bytes]]:
+    """Parse a Content-Type header value.
+
+    Returns the lowercased media type and a dict of its parameters,
+    keyed by their lowercased name, with quoted values unquoted.
+
+    Raises ``HttpParserInvalidHeaderError`` if there is no media type.
+    """
+
+def parse_accept(data: _Buffer) -> list[tuple[bytes, float]]:
+    """Parse an Accept-style header value into ``(value, q)`` pairs,
+    sorted by descending weight.
+
+    Entries with equal weight keep their order; entries with a
+    malformed weight are dropped.
+    """
+
+def parse_host(data: _Buffer) -> tuple[bytes, int | None]:
+    """Split a Host header value into the host and the port.
+
+    Raises ``HttpParserInvalidHeaderError`` if the port is invalid.
+    """
@@ -0,0 +1,360 @@
+#cython: language_level=3
+
+from __future__ import print_function
+from cpython cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE, \
+                     Py_buffer, PyBytes_AS_STRING, PyBytes_FromStringAndSize
+from libc.string cimport memchr
+
+from .errors import HttpParserInvalidHeaderError
+
+cimport cython
+
+
+__all__ = ('parse_cookie', 'parse_content_type', 'parse_accept',
+           'parse_host')
+
+
+cdef inline bint _is_ows(char c) noexcept nogil:
+    return c == b' ' or c == b'\t'
+
+
+cdef inline char _ascii_lower(char c) noexcept nogil:
+    if b'A' <= c <= b'Z':
+        return c + 32
+    return c
+
+
+cdef inline size_t _skip_ows(const char* at, size_t pos,
+                             size_t end) noexcept nogil:
+    while pos < end and _is_ows(at[pos]):
+        pos += 1
+    return pos
+
+
+cdef inline size_t _rstrip_ows(const char* at, size_t start,
+                               size_t end) noexcept nogil:
+    while end > start and _is_ows(at[end - 1]):
+        end -= 1
+    return end
+
+
+cdef inline size_t _find(const char* at, size_t pos, size_t end,
+                         char c) noexcept nogil:
+    cdef const char* p
+
+    if pos >= end:
+        return end
+    p = <const char*>memchr(at + pos, c, end - pos)
+    if p is NULL:
+        return end
+    return <size_t>(p - at)
+
+
+cdef bytes _lower(const char* at, size_t length):
+    cdef:
+        bytes result = PyBytes_FromStringAndSize(NULL, <Py_ssize_t>length)
+        char* out = PyBytes_AS_STRING(result)
+        size_t i
+
+    for i in range(length):
+        out[i] = _ascii_lower(at[i])
+    return result
+
+
+cdef size_t _param_value_end(const char* at, size_t pos,
+                             size_t end) noexcept nogil:
+    # Find the end of a parameter value, skipping over quoted strings
+    # so that a quoted ';' or ',' does not split the value.
+    cdef bint quoted = False
+
+    while pos < end:
+        if quoted:
+            if at[pos] == b'\\':
+                pos += 1
+            elif at[pos] == b'"':
+                quoted = False
+        elif at[pos] == b'"':
+            quoted = True
+        elif at[pos] == b';' or at[pos] == b',':
+            return pos
+        pos += 1
+    return end
+
+
+cdef bytes _param_value(const char* at, size_t start, size_t end):
+    # Unquote a quoted-string (RFC 9110, section 5.6.4); tokens are
+    # returned as they are.
+    cdef:
+        bytes result
+        char* out
+        size_t i, n = 0
+
+    if end - start < 2 or at[start] != b'"' or at[end - 1] != b'"':
+        return at[start:end]
+
+    start += 1
+    end -= 1
+    if memchr(at + start, b'\\', end - start) is NULL:
+        return at[start:end]
+
+    result = PyBytes_FromStringAndSize(NULL, <Py_ssize_t>(end - start))
+    out = PyBytes_AS_STRING(result)
+    i = start
+    while i < end:
+        if at[i] == b'\\' and i + 1 < end:
+            i += 1
+        out[n] = at[i]
+        n += 1
+        i += 1
+    return result[:n]
+
+
+cdef dict cookies_from_bytes(const char* at, size_t length):
+    cdef:
+        dict cookies = {}
+        size_t pos = 0
+        size_t end, eq, name_end, value_start, value_end
+        bytes name
+
+    while pos < length:
+        end = _find(at, pos, length, b';')
+        eq = _find(at, pos, end, b'=')
+
+        if eq < end:
+            pos = _skip_ows(at, pos, eq)
+            name_end = _rstrip_ows(at, pos, eq)
+            value_start = _skip_ows(at, eq + 1, end)
+            value_end = _rstrip_ows(at, value_start, end)
+
+            if (value_end - value_start >= 2 and
+                    at[value_start] == b'"' and at[value_end - 1] == b'"'):
+                value_start += 1
+                value_end -= 1
+
+            if name_end > pos:
+                name = at[pos:name_end]
+                # The first occurrence wins: user agents send cookies
+                # with more specific paths first (RFC 6265, section 5.4).
+                if name not in cookies:
+                    cookies[name] = at[value_start:value_end]
+
+        pos = end + 1
+
+    return cookies
+
+
+cdef void _parse_params(const char* at, size_t pos, size_t end,
+                        dict params) except *:
+    # Parse ';'-separated parameters starting at ``pos`` into ``params``.
+    cdef:
+        size_t name_start, name_end, value_start, value_end
+
+    while pos < end:
+        name_start = _skip_ows(at, pos + 1, end)
+        name_end = name_start
+        while name_end < end and at[name_end] != b'=' and at[name_end] != b';':
+            name_end += 1
+
+        if name_end == end or at[name_end] != b'=':
+            pos = name_end
+            continue
+
+        value_start = _skip_ows(at, name_end + 1, end)
+        pos = _param_value_end(at, value_start, end)
+        if pos < end and at[pos] == b',':
+            # A list is not a valid Content-Type value; ignore the rest.
+            end = pos
+        value_end = _rstrip_ows(at, value_start, pos)
+        name_end = _rstrip_ows(at, name_start, name_end)
+
+        if name_end > name_start:
+            params[_lower(at + name_start, name_end - name_start)] = \
+                _param_value(at, value_start, value_end)
+
+
+cdef tuple content_type_from_bytes(const char* at, size_t length):
+    cdef:
+        size_t start = _skip_ows(at, 0, length)
+        size_t end = _find(at, start, length, b';')
+        size_t type_end = _rstrip_ows(at, start, end)
+        dict params = {}
+
+    if memchr(at + start, b'/', type_end - start) is NULL:
+        raise HttpParserInvalidHeaderError(
+            'invalid media type {!r}'.format(at[start:type_end]))
+
+    _parse_params(at, end, length, params)
+
+    return _lower(at + start, type_end - start), params
+
+
+cdef int _parse_qvalue(const char* at, size_t length) noexcept nogil:
+    # Returns the qvalue (RFC 9110, section 12.4.2) in thousandths,
+    # or -1 if it is malformed.
+    cdef:
+        int q
+        size_t i
+
+    if length == 0 or length > 5 or (at[0] != b'0' and at[0] != b'1'):
+        return -1
+    q = at[0] - c'0'
+    if length == 1:
+        return q * 1000
+    if at[1] != b'.':
+        return -1
+    for i in range(2, 5):
+        q *= 10
+        if i < length:
+            if not b'0' <= at[i] <= b'9':
+                return -1
+            q += at[i] - c'0'
+    if q > 1000:
+        return -1
+    return q
+
+
+cdef list accept_from_bytes(const char* at, size_t length):
+    cdef:
+        list entries = []
+        size_t pos = 0
+        size_t start, end, value_end, param, name, param_end, eq, q_start
+        bytes value
+        bint weighted
+        int q
+
+    while pos < length:
+        start = _skip_ows(at, pos, length)
+        end = _param_value_end(at, start, length)
+        value_end = _rstrip_ows(at, start, end)
+        value = None
+        weighted = False
+        q = 1000
+
+        # Media range parameters stay part of the value, empty ones are
+        # dropped, and so are the weight and anything after it.
+        while end < length and at[end] != b',':
+            param = end
+            end = _param_value_end(at, param + 1, length)
+            if weighted:
+                continue
+
+            name = _skip_ows(at, param + 1, end)
+            param_end = _rstrip_ows(at, name, end)
+            if param_end == name:
+                if value is None:
+                    value = at[start:value_end]
+                continue
+
+            eq = _skip_ows(at, name + 1, param_end)
+            if (eq < param_end and _ascii_lower(at[name]) == b'q' and
+                    at[eq] == b'='):
+                weighted = True
+                q_start = _skip_ows(at, eq + 1, param_end)
+                q = _parse_qvalue(at + q_start, param_end - q_start)
+            elif value is None:
+                value_end = param_end
+            else:
+                value += at[param:param_end]
+
+        if value is None:
+            value = at[start:value_end]
+        if value and q >= 0:
+            entries.append((value, q / 1000))
+
+        pos = end + 1
+
+    # list.sort() is stable also with reverse=True, so entries of equal
+    # weight keep the order of the header.
+    entries.sort(key=_weight, reverse=True)
+    return entries
+
+
+def _weight(entry):
+    return entry[1]
+
+
+cdef tuple host_from_bytes(const char* at, size_t length):
+    cdef:
+        size_t start = _skip_ows(at, 0, length)
+        size_t end = _rstrip_ows(at, start, length)
+        size_t host_start = start, host_end, colon
+        long port = 0
+        size_t i
+
+    if start < end and at[start] == b'[':
+        # IP literal (RFC 3986, section 3.2.2); returned without the
+        # brackets, like parse_url() does.
+        host_end = _find(at, start, end, b']')
+        if host_end == end:
+            raise HttpParserInvalidHeaderError(
+                'invalid host {!r}'.format(at[start:end]))
+        host_start = start + 1
+        colon = host_end + 1
+        if colon < end and at[colon] != b':':
+            raise HttpParserInvalidHeaderError(
+                'invalid host {!r}'.format(at[start:end]))
+    else:
+        colon = _find(at, start, end, b':')
+        host_end = colon
+
+    if colon + 1 >= end:
+        # No port, or an empty one (allowed by RFC 3986).
+        return at[host_start:host_end], None
+
+    if end - colon - 1 > 5:
+        raise HttpParserInvalidHeaderError(
+            'invalid port in host {!r}'.format(at[start:end]))
+    for i in range(colon + 1, end):
+        if not b'0' <= at[i] <= b'9':
+            raise HttpParserInvalidHeaderError(
+                'invalid port in host {!r}'.format(at[start:end]))
+        port = port * 10 + (at[i] - c'0')
+    if port > 65535:
+        raise HttpParserInvalidHeaderError(
+            'invalid port in host {!r}'.format(at[start:end]))
+
+    return at[host_start:host_end], port
+
+
+def parse_cookie(data):
+    cdef Py_buffer py_buf
+
+    PyObject_GetBuffer(data, &py_buf, PyBUF_SIMPLE)
+    try:
+        return cookies_from_bytes(<const char*>py_buf.buf,
+                                  <size_t>py_buf.len)
+    finally:
+        PyBuffer_Release(&py_buf)
+
+
+def parse_content_type(data):
+    cdef Py_buffer py_buf
+
+    PyObject_GetBuffer(data, &py_buf, PyBUF_SIMPLE)
+    try:
+        return content_type_from_bytes(<const char*>py_buf.buf,
+                                       <size_t>py_buf.len)
+    finally:
+        PyBuffer_Release(&py_buf)
+
+
+def parse_accept(data):
+    cdef Py_buffer py_buf
+
+    PyObject_GetBuffer(data, &py_buf, PyBUF_SIMPLE)
+    try:
+        return accept_from_bytes(<const char*>py_buf.buf,
+                                 <size_t>py_buf.len)
+    finally:
+        PyBuffer_Release(&py_buf)
+
+
+def parse_host(data):
+    cdef Py_buffer py_buf
+
+    PyObject_GetBuffer(data, &py_buf, PyBUF_SIMPLE)
+    try:
+        return host_from_bytes(<const char*>py_buf.buf,
+                               <size_t>py_buf.len)
+    finally:
+        PyBuffer_Release(&py_buf)
@@ -0,0 +1,44 @@
+cdef enum _MultipartState:
+    MP_PREAMBLE
+    MP_AFTER_BOUNDARY
+    MP_AFTER_BOUNDARY_DASH
+    MP_AFTER_BOUNDARY_CR
+    MP_HEADERS
+    MP_DATA
+    MP_EPILOGUE
+
+
+cdef class MultipartParser:
+
+    cdef:
+        bytes _delim
+        const char* _delim_p
+        size_t _delim_len
+        size_t* _fail
+
+        _MultipartState _state
+        size_t _matched
+        size_t _held
+
+        char* _headers_buf
+        size_t _headers_buf_size
+        size_t _headers_len
+
+        bint _zero_copy
+        object _part_fd
+
+        _proto_on_part_begin, _proto_on_part_header, \
+        _proto_on_part_headers_complete, _proto_on_part_data, \
+        _proto_on_part_end
+
+    cdef _emit(self, const char* at, size_t length)
+    cdef Py_ssize_t _scan(self, const char* at, size_t length,
+                          bint* found) except -1
+    cdef _on_headers_complete(self)
+    cdef Py_ssize_t _feed_headers(self, const char* at,
+                                  size_t length) except -1
+    cdef _feed(self, const char* at, size_t length)
+    cdef _finish(self)
+
+
+cdef bytes boundary_from_content_type(bytes content_type)
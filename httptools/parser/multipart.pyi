@@ -0,0 +1,47 @@
+from array import array
+from typing import Protocol
+
+class MultipartProtocol(Protocol):
+    def on_part_begin(self) -> None: ...
+    def on_part_header(self, name: bytes, value: bytes) -> None: ...
+    def on_part_headers_complete(self) -> None: ...
+    def on_part_data(self, data: bytes | memoryview) -> None: ...
+    def on_part_end(self) -> None: ...
+
+class MultipartParser:
+    def __init__(
+        self,
+        boundary: bytes,
+        protocol: MultipartProtocol | object,
+        *,
+        zero_copy: bool = False,
+    ) -> None:
+        """Streaming ``multipart/*`` body parser.
+
+        Args:
+            boundary (bytes): The ``boundary`` parameter of the
+                ``Content-Type`` header.
+            protocol (MultipartProtocol): Callback interface for the parser.
+            zero_copy (bool): Pass part data to ``on_part_data`` as
+                ``memoryview`` objects over the fed buffer.  They are
+                released when the callback returns.
+        """
+
+    def set_part_fd(self, fd: int | None) -> None:
+        """Write the data of the current part to the file descriptor
+        ``fd`` instead of passing it to ``on_part_data``.
+
+        Meant to be called from ``on_part_begin``, ``on_part_header`` or
+        ``on_part_headers_complete``; applies until the part ends."""
+
+    def feed_data(self, data: bytes | bytearray | memoryview | array[int]) -> None:
+        """Feed body data to the parser."""
+
+    def finish(self) -> None:
+        """Signal the end of the body.
+
+        Raises ``HttpParserMultipartError`` if the closing boundary has
+        not been seen."""
+
+    def is_complete(self) -> bool:
+        """Return ``True`` once the closing boundary has been parsed."""
@@ -0,0 +1,299 @@
+#cython: language_level=3
+
+from __future__ import print_function
+
+import os
+
+from cpython.mem cimport PyMem_Malloc, PyMem_Realloc, PyMem_Free
+from cpython cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE, \
+                     Py_buffer, PyBytes_AS_STRING, PyBytes_FromStringAndSize
+from libc.string cimport memchr, memcmp
+
+from .python cimport PyMemoryView_FromMemory, PyBUF_READ
+
+from .errors import HttpParserMultipartError, HttpParserInvalidHeaderError
+
+cimport cython
+from .header_parser cimport content_type_from_bytes
+
+
+__all__ = ('MultipartParser',)
+
+DEF MAX_BOUNDARY_LENGTH = 70
+DEF MAX_PART_HEADERS_SIZE = 16 * 1024
+
+
+cdef class MultipartParser:
+
+    def __cinit__(self):
+        self._fail = NULL
+        self._headers_buf = NULL
+
+    def __init__(self, boundary, protocol, *, zero_copy=False):
+        cdef:
+            size_t j, k
+
+        if not isinstance(boundary, bytes):
+            raise TypeError(
+                'boundary must be bytes, not {}'.format(
+                    type(boundary).__name__))
+        if not 0 < len(boundary) <= MAX_BOUNDARY_LENGTH:
+            raise ValueError(
+                'boundary must be 1 to {} bytes long'.format(
+                    MAX_BOUNDARY_LENGTH))
+
+        self._delim = b'\r\n--' + boundary
+        self._delim_p = PyBytes_AS_STRING(self._delim)
+        self._delim_len = len(self._delim)
+
+        # KMP failure function of the delimiter, so that a delimiter
+        # split between two feeds is matched without buffering data.
+        self._fail = <size_t*>PyMem_Realloc(
+            self._fail, self._delim_len * sizeof(size_t))
+        if self._fail is NULL:
+            raise MemoryError()
+        self._fail[0] = k = 0
+        for j in range(1, self._delim_len):
+            while k > 0 and self._delim_p[j] != self._delim_p[k]:
+                k = self._fail[k - 1]
+            if self._delim_p[j] == self._delim_p[k]:
+                k += 1
+            self._fail[j] = k
+
+        # The body starts with the first boundary without the CRLF
+        # that precedes every other one: pretend it has been seen.
+        self._state = MP_PREAMBLE
+        self._matched = self._held = 2
+
+        self._headers_len = 0
+        self._zero_copy = zero_copy
+        self._part_fd = None
+
+        self._proto_on_part_begin = getattr(protocol, 'on_part_begin', None)
+        self._proto_on_part_header = getattr(
+            protocol, 'on_part_header', None)
+        self._proto_on_part_headers_complete = getattr(
+            protocol, 'on_part_headers_complete', None)
+        self._proto_on_part_data = getattr(protocol, 'on_part_data', None)
+        self._proto_on_part_end = getattr(protocol, 'on_part_end', None)
+
+    def __dealloc__(self):
+        PyMem_Free(self._fail)
+        PyMem_Free(self._headers_buf)
+
+    cdef _emit(self, const char* at, size_t length):
+        cdef object view
+        cdef Py_ssize_t written
+
+        if self._state == MP_PREAMBLE or length == 0:
+            return
+
+        if self._part_fd is not None:
+            view = PyMemoryView_FromMemory(
+                <char*>at, <Py_ssize_t>length, PyBUF_READ)
+            try:
+                while view:
+                    written = os.write(self._part_fd, view)
+                    view = view[written:]
+            finally:
+                view = None
+
+        elif self._proto_on_part_data is not None:
+            if self._zero_copy:
+                view = PyMemoryView_FromMemory(
+                    <char*>at, <Py_ssize_t>length, PyBUF_READ)
+                try:
+                    self._proto_on_part_data(view)
+                finally:
+                    # The memory belongs to the caller of feed_data();
+                    # make sure it cannot be used after the callback.
+                    view.release()
+            else:
+                self._proto_on_part_data(at[:length])
+
+    cdef Py_ssize_t _scan(self, const char* at, size_t length,
+                          bint* found) except -1:
+        cdef:
+            const char* delim = self._delim_p
+            const char* p
+            size_t m = self._matched
+            size_t i = 0
+            size_t end, k, newm
+            char c
+
+        found[0] = False
+
+        while i < length:
+            if m == 0:
+                p = <const char*>memchr(at + i, b'\r', length - i)
+                if p is NULL:
+                    i = length
+                    break
+                i = <size_t>(p - at)
+
+            c = at[i]
+            while m > 0 and c != delim[m]:
+                newm = self._fail[m - 1]
+                if self._held > 0:
+                    # Bytes held back from a previous feed turned out
+                    # not to be a delimiter.  They equal a prefix of it.
+                    k = min(m - newm, self._held)
+                    self._emit(delim, k)
+                    self._held -= k
+                m = newm
+            if c == delim[m]:
+                m += 1
+            i += 1
+
+            if m == self._delim_len:
+                end = i - (m - self._held)
+                self._matched = self._held = 0
+                self._emit(at, end)
+                found[0] = True
+                return <Py_ssize_t>i
+
+        # Keep the bytes that may start a delimiter until the next feed.
+        end = length - (m - self._held)
+        self._matched = self._held = m
+        self._emit(at, end)
+        return <Py_ssize_t>length
+
+    cdef _on_headers_complete(self):
+        cdef bytes block = PyBytes_FromStringAndSize(
+            self._headers_buf, <Py_ssize_t>self._headers_len - 2)
+
+        for line in block.split(b'\r\n'):
+            if not line:
+                continue
+            name, sep, value = line.partition(b':')
+            if not sep:
+                raise HttpParserMultipartError(
+                    'invalid part header {!r}'.format(line))
+            if self._proto_on_part_header is not None:
+                self._proto_on_part_header(name.strip(b' \t'),
+                                           value.strip(b' \t'))
+
+        self._headers_len = 0
+        self._state = MP_DATA
+        self._matched = self._held = 0
+
+        if self._proto_on_part_headers_complete is not None:
+            self._proto_on_part_headers_complete()
+
+    cdef Py_ssize_t _feed_headers(self, const char* at,
+                                  size_t length) except -1:
+        cdef:
+            size_t i
+            size_t n
+            char* buf
+
+        for i in range(length):
+            n = self._headers_len
+            if n == self._headers_buf_size:
+                if n == MAX_PART_HEADERS_SIZE:
+                    raise HttpParserMultipartError(
+                        'part headers exceed {} bytes'.format(
+                            MAX_PART_HEADERS_SIZE))
+                n = n * 2 if n else 256
+                buf = <char*>PyMem_Realloc(self._headers_buf, n)
+                if buf is NULL:
+                    raise MemoryError()
+                self._headers_buf = buf
+                self._headers_buf_size = n
+                n = self._headers_len
+
+            self._headers_buf[n] = at[i]
+            n += 1
+            self._headers_len = n
+
+            if at[i] == b'\n' and (
+                    (n == 2 and self._headers_buf[0] == b'\r') or
+                    (n >= 4 and memcmp(self._headers_buf + n - 4,
+                                       b'\r\n\r\n', 4) == 0)):
+                self._on_headers_complete()
+                return <Py_ssize_t>(i + 1)
+
+        return <Py_ssize_t>length
+
+    cdef _feed(self, const char* at, size_t length):
+        cdef:
+            size_t i = 0
+            bint found
+            char c
+
+        while i < length:
+            if self._state == MP_DATA or self._state == MP_PREAMBLE:
+                i += <size_t>self._scan(at + i, length - i, &found)
+                if found:
+                    if self._state == MP_DATA:
+                        self._part_fd = None
+                        if self._proto_on_part_end is not None:
+                            self._proto_on_part_end()
+                    self._state = MP_AFTER_BOUNDARY
+
+            elif self._state == MP_HEADERS:
+                i += <size_t>self._feed_headers(at + i, length - i)
+
+            elif self._state == MP_EPILOGUE:
+                return
+
+            else:
+                c = at[i]
+                i += 1
+                if self._state == MP_AFTER_BOUNDARY:
+                    if c == b'-':
+                        self._state = MP_AFTER_BOUNDARY_DASH
+                    elif c == b'\r':
+                        self._state = MP_AFTER_BOUNDARY_CR
+                    elif c != b' ' and c != b'\t':
+                        raise HttpParserMultipartError(
+                            'invalid multipart boundary line')
+                elif self._state == MP_AFTER_BOUNDARY_DASH:
+                    if c != b'-':
+                        raise HttpParserMultipartError(
+                            'invalid multipart boundary line')
+                    self._state = MP_EPILOGUE
+                else:
+                    if c != b'\n':
+                        raise HttpParserMultipartError(
+                            'invalid multipart boundary line')
+                    self._state = MP_HEADERS
+                    if self._proto_on_part_begin is not None:
+                        self._proto_on_part_begin()
+
+    cdef _finish(self):
+        if self._state != MP_EPILOGUE:
+            raise HttpParserMultipartError(
+                'multipart body ended before the closing boundary')
+
+    ### Public API ###
+
+    def set_part_fd(self, fd):
+        self._part_fd = fd
+
+    def feed_data(self, data):
+        cdef Py_buffer buf
+
+        PyObject_GetBuffer(data, &buf, PyBUF_SIMPLE)
+        try:
+            self._feed(<const char*>buf.buf, <size_t>buf.len)
+        finally:
+            PyBuffer_Release(&buf)
+
+    def finish(self):
+        self._finish()
+
+    def is_complete(self):
+        return self._state == MP_EPILOGUE
+
+
+cdef bytes boundary_from_content_type(bytes content_type):
+    try:
+        mime, params = content_type_from_bytes(
+            PyBytes_AS_STRING(content_type), len(content_type))
+    except HttpParserInvalidHeaderError:
+        return None
+
+    if not mime.startswith(b'multipart/'):
+        return None
+    return params.get(b'boundary') or None
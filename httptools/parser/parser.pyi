@@ -1,6 +1,14 @@
 from array import array
+from os import PathLike
+from typing import Iterable
+from .multipart import MultipartParser, MultipartProtocol
 from .protocol import HTTPProtocol
 
+FEED_OK: int
+FEED_PAUSED: int
+FEED_UPGRADE: int
+FEED_ERROR: int
+
 class HttpParser:
     def __init__(self, protocol: HTTPProtocol | object) -> None:
         """The HTTP parser.
@@ -24,6 +32,42 @@ class HttpParser:
     ) -> None:
         """Set dangerous leniencies for the parser."""
 
+    def enable_content_decoding(
+        self, max_size: int | None = None, block_size: int = 64 * 1024
+    ) -> None:
+        """Decode gzip and deflate bodies before they reach ``on_body``.
+
+        The ``Content-Encoding`` header is picked up while the headers
+        are parsed and the body is fed to zlib straight from the input
+        buffer.  Decoded data is delivered to ``on_body`` in blocks of
+        at least ``block_size`` bytes (except for the last one).
+        ``HttpParserDecodingError`` is raised if the body is corrupt or
+        truncated, or if the decoded body grows beyond ``max_size``
+        bytes.  Bodies with other encodings are passed through
+        unchanged.  Concatenated gzip members are decoded as one body.
+
+        Raises ``TypeError`` if the protocol has no ``on_body``.
+        """
+
+    def enable_multipart(
+        self, protocol: MultipartProtocol | object, *, zero_copy: bool = False
+    ) -> None:
+        """Parse ``multipart/*`` bodies natively.
+
+        When a message has a multipart ``Content-Type`` with a
+        ``boundary``, its body is fed to a ``MultipartParser`` with the
+        given ``protocol`` instead of being passed to ``on_body``.
+        A malformed or truncated body raises
+        ``HttpParserMultipartError``.
+        """
+
+    def get_multipart(self) -> MultipartParser | None:
+        """Return the ``MultipartParser`` of the current message.
+
+        Available from ``on_headers_complete`` until the body has been
+        parsed, e.g. to call ``set_part_fd()`` from the multipart
+        protocol; ``None`` if the message has no multipart body."""
+
     def get_http_version(self) -> str:
         """Retrieve the HTTP protocol version e.g. "1.1"."""
 
@@ -45,14 +89,145 @@ class HttpParser:
         set to the offset of the non-HTTP data in ``data``.
         """
 
+    def feed_data_status(
+        self, data: bytes | bytearray | memoryview | array[int]
+    ) -> tuple[int, int, int, int]:
+        """Feed data to the parser without raising parser errors.
+
+        Returns ``(status, errno, error_pos, consumed)``: ``status`` is
+        one of ``FEED_OK``, ``FEED_PAUSED``, ``FEED_UPGRADE`` or
+        ``FEED_ERROR``, ``errno`` the llhttp error number (0 if none),
+        ``error_pos`` the offset in ``data`` where parsing stopped (-1
+        if it did not), and ``consumed`` the number of bytes parsed.
+        On upgrade, ``consumed`` is the offset of the non-HTTP data.
+
+        Exceptions raised by protocol callbacks are not propagated
+        either; use ``get_error()`` to retrieve them.
+        """
+
+    def get_error(self) -> Exception | None:
+        """Return the exception ``feed_data()`` would have raised for
+        the current error state, or ``None`` if there is no error."""
+
+    def get_error_pos(self) -> int:
+        """Return the offset at which parsing stopped on an error.
+
+        The offset is relative to the ``data`` of the failed
+        ``feed_data()`` or ``feed_data_status()`` call, or to the start
+        of the file for ``feed_file()``; -1 if it is not known."""
+
+    def feed_eof(self) -> None:
+        """Signal the end of the input.
+
+        Completes a message that is delimited by the end of the
+        connection, such as a response without ``Content-Length``.
+        Raises ``HttpParserError`` if the input ends in the middle of
+        a message.  Does nothing if the parser is in an error state.
+        """
+
+    def feed_file(
+        self,
+        file: str | PathLike[str] | int,
+        offset: int = 0,
+        stride: int = 16 * 1024 * 1024,
+        *,
+        spans: bool = False,
+    ) -> int:
+        """Feed the contents of a file to the parser, starting at ``offset``.
+
+        ``file`` is a path or a file descriptor.  The file is
+        memory-mapped and passed to the parser ``stride`` bytes at a
+        time, which is the same as ``feed_data()`` on the mapping.
+
+        With ``spans=True``, the ``on_url_span``, ``on_header_span``,
+        ``on_body_span`` and ``on_message_span`` callbacks of the
+        protocol are called, if defined, instead of ``on_url``,
+        ``on_header`` and ``on_body``.  They receive file offsets and
+        lengths instead of ``bytes``, so no fragment of the file is
+        copied.  Adjacent URL and body fragments are reported as one
+        span, regardless of ``stride``.  ``on_message_span`` follows
+        ``on_message_complete`` and covers the whole message.  Bodies
+        that are decoded or parsed as multipart are still delivered as
+        usual.
+
+        Returns the file offset the parser has reached, which can be
+        passed back as ``offset`` to continue once the file has grown.
+        On HTTP upgrade, the ``HttpParserUpgrade`` offset is relative to
+        the start of the file.
+        """
+
 class HttpRequestParser(HttpParser):
     """Used for parsing http requests from the server side."""
 
     def get_method(self) -> bytes:
         """Retrieve the HTTP method of the request."""
 
+    def enable_cache_key(
+        self, headers: Iterable[bytes] = (), key: bytes | None = None
+    ) -> None:
+        """Compute a cache key while the request head is parsed.
+
+        The key is a keyed SipHash-2-4 over the method, the normalized
+        URL and the values of ``headers`` (matched case-insensitively,
+        order of appearance in the request does not matter), updated
+        incrementally as the data is fed.
+
+        The URL is reduced to its path and query: the scheme and
+        authority of an absolute-form target and the fragment are
+        dropped, so include ``b'host'`` in ``headers`` if keys must
+        differ between hosts.  Percent-encoded unreserved characters
+        are decoded and other escapes upper-cased (RFC 3986, section
+        6.2.2); dot segments are not removed.
+
+        ``key`` is the 16-byte SipHash key.  By default a random key
+        is generated when the module is loaded, once per process and
+        per subinterpreter, so pass an explicit one if keys are shared
+        between processes or interpreters.
+        """
+
+    def get_cache_key(self) -> int | None:
+        """Return the cache key of the current request.
+
+        Available from ``on_headers_complete`` on; ``None`` before
+        that or if ``enable_cache_key`` was not called."""
+
 class HttpResponseParser(HttpParser):
     """Used for parsing http responses from the client side."""
 
     def get_status_code(self) -> int:
         """Retrieve the status code of the HTTP response."""
+
+    def get_status_line(self) -> tuple[tuple[int, int], int, bytes]:
+        """Retrieve ``((major, minor), status_code, reason)``.
+
+        Does not require an ``on_status`` callback.  Reason phrases of
+        the standard status codes are shared ``bytes`` objects."""
+
+class RequestHead:
+    method: bytes
+    url: bytes
+    http_version: str
+    headers: dict[bytes, bytes]
+    body_offset: int
+
+    # These parse the corresponding header on first use, and return
+    # None if it was not present or not in ``wanted_headers``.
+    def get_cookies(self) -> dict[bytes, bytes] | None: ...
+    def get_content_type(self) -> tuple[bytes, dict[bytes, bytes]] | None: ...
+    def get_accept(self) -> list[tuple[bytes, float]] | None: ...
+    def get_host(self) -> tuple[bytes, int | None] | None: ...
+
+def parse_request_head(
+    data: bytes | bytearray | memoryview | array[int],
+    wanted_headers: Iterable[bytes] = (),
+) -> RequestHead:
+    """Parse a complete request head without invoking any callbacks.
+
+    Only the headers listed in ``wanted_headers`` (matched
+    case-insensitively) are returned, keyed by their lowercased name.
+
+    Raises ``HttpParserIncomplete`` if ``data`` does not contain the
+    full head yet.  The framing of the body (``Transfer-Encoding``,
+    ``Content-Length``) is validated like ``HttpRequestParser`` does,
+    but the body itself is not parsed.
+    """
@@ -1,13 +1,20 @@
 #cython: language_level=3
 
 from __future__ import print_function
-from typing import Optional
 
-from cpython.mem cimport PyMem_Malloc, PyMem_Free
+import os
+
+from cpython.mem cimport PyMem_Malloc, PyMem_Realloc, PyMem_Free
 from cpython cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE, \
-                     Py_buffer, PyBytes_AsString
+                     Py_buffer, PyBytes_AsString, PyBytes_AS_STRING, \
+                     PyBytes_FromStringAndSize
+from cpython.exc cimport PyErr_CheckSignals
+
+from libc.stdint cimport uint64_t
+from libc.string cimport memcmp, memcpy, strlen
 
-from .python cimport PyMemoryView_Check, PyMemoryView_GET_BUFFER
+from .python cimport PyMemoryView_Check, PyMemoryView_GET_BUFFER, \
+                     PyMemoryView_FromMemory, PyBUF_READ
 
 
 from .errors import (HttpParserError,
@@ -15,13 +22,448 @@ from .errors import (HttpParserError,
                      HttpParserInvalidStatusError,
                      HttpParserInvalidMethodError,
                      HttpParserInvalidURLError,
-                     HttpParserUpgrade)
+                     HttpParserUpgrade,
+                     HttpParserIncomplete,
+                     HttpParserDecodingError,
+                     HttpParserMultipartError)
 
 cimport cython
 from . cimport cparser
+from .siphash cimport siphash_t, siphash_init, siphash_update, \
+                      siphash_update_u64, siphash_final
+from .multipart cimport MultipartParser, boundary_from_content_type
+from .header_parser cimport cookies_from_bytes, content_type_from_bytes, \
+                            accept_from_bytes, host_from_bytes
+
+
+__all__ = ('HttpRequestParser', 'HttpResponseParser', 'parse_request_head',
+           'FEED_OK', 'FEED_PAUSED', 'FEED_UPGRADE', 'FEED_ERROR')
+
+DEF FEED_FILE_STRIDE = 16 * 1024 * 1024
+
+DEF BUF_MIN_SIZE = 256
+
+DEF DECODED_BLOCK_SIZE = 64 * 1024
+
+DEF CACHE_KEY_MAX_HEADERS = 64
+DEF CACHE_KEY_MAX_NAME = 256
+DEF CACHE_KEY_MAX_SCHEME = 16
+
+# Random SipHash key used when no explicit cache key is given.  Like
+# all module globals it is per interpreter.
+_CACHE_KEY_SECRET = os.urandom(16)
+
+# Status codes returned by feed_data_status().
+cdef enum:
+    FS_OK = 0
+    FS_PAUSED = 1
+    FS_UPGRADE = 2
+    FS_ERROR = 3
+
+FEED_OK = FS_OK
+FEED_PAUSED = FS_PAUSED
+FEED_UPGRADE = FS_UPGRADE
+FEED_ERROR = FS_ERROR
+
+
+@cython.internal
+cdef class _BodyDecoder:
+
+    cdef:
+        object on_body
+        object max_size
+        Py_ssize_t block_size
+
+        bytes encoding
+        object decompressor
+        size_t total
+        bint fed
+
+        list pending
+        Py_ssize_t pending_len
+
+    def __cinit__(self, on_body, max_size, Py_ssize_t block_size):
+        self.on_body = on_body
+        self.max_size = max_size
+        self.block_size = block_size
+        self.pending = []
+        self.reset()
+
+    cdef reset(self):
+        self.encoding = None
+        self.decompressor = None
+        self.total = 0
+        self.fed = False
+        self.pending.clear()
+        self.pending_len = 0
+
+    cdef set_encoding(self, bytes value):
+        self.encoding = value.strip().lower()
+
+    cdef start(self):
+        # zlib is imported where needed, to keep it out of the import
+        # time of the package.
+        import zlib
+
+        if self._is_gzip():
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == b'deflate':
+            # Created on the first body byte, see feed().
+            self.decompressor = False
+        else:
+            # No encoding, identity, or one we cannot decode: the body
+            # is passed through as is.
+            self.decompressor = None
+
+    cdef bint active(self):
+        return self.decompressor is not None
+
+    cdef bint _is_gzip(self):
+        return self.encoding in (b'gzip', b'x-gzip')
+
+    cdef feed(self, const char *at, size_t length):
+        cdef object view, data
+
+        if length == 0:
+            return
+        self.fed = True
+
+        if self.decompressor is False:
+            import zlib
+
+            # "deflate" is meant to be zlib-wrapped, but raw deflate
+            # streams are common in the wild.
+            if (<unsigned char>at[0] & 0x0f) == 8:
+                self.decompressor = zlib.decompressobj(zlib.MAX_WBITS)
+            else:
+                self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+        # The span is handed to zlib without copying it into bytes.
+        view = data = PyMemoryView_FromMemory(
+            <char*>at, <Py_ssize_t>length, PyBUF_READ)
+        try:
+            while data:
+                if self.decompressor.eof:
+                    self._next_member()
+                self._decompress(data)
+                if self.decompressor.eof:
+                    data = self.decompressor.unused_data
+                else:
+                    data = self.decompressor.unconsumed_tail
+        finally:
+            view.release()
+
+        if self.pending_len >= self.block_size:
+            self._emit()
+
+    cdef finish(self):
+        if self.decompressor:
+            try:
+                out = self.decompressor.flush()
+            except Exception as ex:
+                self._raise_error(ex)
+            self._append(out)
+            if self.fed and not self.decompressor.eof:
+                raise HttpParserDecodingError(
+                    'truncated {} body'.format(self.encoding.decode()))
+        if self.pending_len:
+            self._emit()
+
+    cdef _next_member(self):
+        # A gzip body may consist of several members (RFC 1952, section
+        # 2.2), anything else must end with the compressed stream.
+        import zlib
+
+        if not self._is_gzip():
+            raise HttpParserDecodingError(
+                'data after the end of the {} body'.format(
+                    self.encoding.decode()))
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    cdef _decompress(self, data):
+        try:
+            if self.max_size is None:
+                out = self.decompressor.decompress(data)
+            else:
+                out = self.decompressor.decompress(
+                    data, self.max_size - self.total + 1)
+        except Exception as ex:
+            self._raise_error(ex)
+        self._append(out)
+
+    cdef _raise_error(self, ex):
+        import zlib
+
+        if isinstance(ex, zlib.error):
+            raise HttpParserDecodingError(
+                'invalid {} body: {}'.format(self.encoding.decode(), ex)
+            ) from ex
+        raise ex
+
+    cdef _append(self, bytes out):
+        if not out:
+            return
+        self.total += len(out)
+        if self.max_size is not None and self.total > self.max_size:
+            raise HttpParserDecodingError(
+                'decoded body exceeds the maximum of {} bytes'
+                .format(self.max_size))
+        self.pending.append(out)
+        self.pending_len += len(out)
+
+    cdef _emit(self):
+        if len(self.pending) == 1:
+            block = self.pending[0]
+        else:
+            block = b''.join(self.pending)
+        self.pending.clear()
+        self.pending_len = 0
+        self.on_body(block)
 
 
-__all__ = ('HttpRequestParser', 'HttpResponseParser')
+cdef enum _UrlState:
+    URL_START
+    URL_SCHEME
+    URL_SLASHES
+    URL_AUTHORITY
+    URL_PATH
+    URL_ESCAPE
+    URL_FRAGMENT
+
+
+@cython.internal
+cdef class _CacheKey:
+
+    cdef:
+        uint64_t k0, k1
+        tuple names
+
+        # The URL is normalized while it is hashed: an absolute-form
+        # target is reduced to its path and query, the fragment is
+        # dropped, and percent-encoding is normalized as described in
+        # RFC 3986, section 6.2.2.  A possible scheme is held back in
+        # url_buf until it is known to be followed by "://".
+        siphash_t url
+        _UrlState url_state
+        char url_buf[CACHE_KEY_MAX_SCHEME + 3]
+        size_t url_buf_len
+        char escape[2]
+        size_t escape_len
+
+        siphash_t headers[CACHE_KEY_MAX_HEADERS]
+        uint64_t seen
+
+        char name[CACHE_KEY_MAX_NAME]
+        size_t name_len
+        bint in_value
+        Py_ssize_t current
+
+        uint64_t key
+        bint ready
+
+    def __cinit__(self, tuple names, bytes secret):
+        cdef const char *k = PyBytes_AS_STRING(secret)
+        self.k0 = int.from_bytes(k[:8], 'little')
+        self.k1 = int.from_bytes(k[8:16], 'little')
+        self.names = names
+        self.reset()
+
+    cdef void reset(self) noexcept:
+        siphash_init(&self.url, self.k0, self.k1)
+        self.url_state = URL_START
+        self.url_buf_len = 0
+        self.escape_len = 0
+        self.seen = 0
+        self.name_len = 0
+        self.in_value = False
+        self.current = -1
+        self.key = 0
+        self.ready = False
+
+    cdef void on_url(self, const char *at, size_t length) noexcept:
+        cdef:
+            size_t i = 0, run
+            char c
+
+        while i < length:
+            c = at[i]
+
+            if self.url_state == URL_PATH:
+                run = i
+                while i < length and at[i] != b'%' and at[i] != b'#':
+                    i += 1
+                siphash_update(&self.url, at + run, i - run)
+                if i < length:
+                    if at[i] == b'#':
+                        self.url_state = URL_FRAGMENT
+                        return
+                    self.url_state = URL_ESCAPE
+                    self.escape_len = 0
+                    i += 1
+
+            elif self.url_state == URL_ESCAPE:
+                if _hex_value(c) < 0:
+                    # Not an escape after all; keep it as is.
+                    siphash_update(&self.url, b'%', 1)
+                    siphash_update(&self.url, self.escape, self.escape_len)
+                    self.url_state = URL_PATH
+                    continue
+                self.escape[self.escape_len] = c
+                self.escape_len += 1
+                i += 1
+                if self.escape_len == 2:
+                    self._hash_escape()
+                    self.url_state = URL_PATH
+
+            elif self.url_state == URL_START:
+                self.url_state = URL_PATH if c == b'/' else URL_SCHEME
+
+            elif self.url_state == URL_SCHEME:
+                if c == b':' and self.url_buf_len > 0:
+                    self.url_state = URL_SLASHES
+                elif not _scheme_char(c, self.url_buf_len):
+                    # Not an absolute-form target, e.g. "*" or the
+                    # authority-form of CONNECT.
+                    self._flush_scheme()
+                    self.url_state = URL_PATH
+                    continue
+                self.url_buf[self.url_buf_len] = c
+                self.url_buf_len += 1
+                i += 1
+
+            elif self.url_state == URL_SLASHES:
+                if c != b'/':
+                    self._flush_scheme()
+                    self.url_state = URL_PATH
+                    continue
+                i += 1
+                if self.url_buf[self.url_buf_len - 1] == b'/':
+                    self.url_buf_len = 0
+                    self.url_state = URL_AUTHORITY
+                else:
+                    self.url_buf[self.url_buf_len] = c
+                    self.url_buf_len += 1
+
+            elif self.url_state == URL_AUTHORITY:
+                while i < length and at[i] != b'/' and at[i] != b'?' and \
+                        at[i] != b'#':
+                    i += 1
+                if i < length:
+                    if at[i] != b'/':
+                        # An empty path is the same as "/".
+                        siphash_update(&self.url, b'/', 1)
+                    self.url_state = URL_PATH
+
+            else:
+                return
+
+    cdef void _flush_scheme(self) noexcept:
+        siphash_update(&self.url, self.url_buf, self.url_buf_len)
+        self.url_buf_len = 0
+
+    cdef void _hash_escape(self) noexcept:
+        cdef char c = <char>(_hex_value(self.escape[0]) * 16 +
+                             _hex_value(self.escape[1]))
+        cdef char escape[3]
+
+        if (c'a' <= c <= c'z' or c'A' <= c <= c'Z' or c'0' <= c <= c'9' or
+                c == c'-' or c == c'.' or c == c'_' or c == c'~'):
+            # Unreserved characters are decoded.
+            siphash_update(&self.url, &c, 1)
+        else:
+            escape[0] = c'%'
+            escape[1] = _ascii_upper(self.escape[0])
+            escape[2] = _ascii_upper(self.escape[1])
+            siphash_update(&self.url, escape, 3)
+
+    cdef void finish_url(self) noexcept:
+        if self.url_state == URL_ESCAPE:
+            siphash_update(&self.url, b'%', 1)
+            siphash_update(&self.url, self.escape, self.escape_len)
+        elif self.url_state == URL_SCHEME or self.url_state == URL_SLASHES:
+            self._flush_scheme()
+        elif self.url_state == URL_AUTHORITY:
+            siphash_update(&self.url, b'/', 1)
+        self.url_state = URL_FRAGMENT
+
+    cdef void on_header_field(self, const char *at, size_t length) noexcept:
+        cdef size_t i
+
+        if self.in_value:
+            self.in_value = False
+            self.name_len = 0
+
+        for i in range(length):
+            if self.name_len == CACHE_KEY_MAX_NAME:
+                return
+            self.name[self.name_len] = _ascii_lower(at[i])
+            self.name_len += 1
+
+    cdef void on_header_value(self, const char *at, size_t length) noexcept:
+        cdef:
+            Py_ssize_t idx
+            bytes name
+
+        if not self.in_value:
+            self.in_value = True
+            self.current = -1
+            for idx in range(len(self.names)):
+                name = <bytes>self.names[idx]
+                if (<size_t>len(name) == self.name_len and
+                        memcmp(PyBytes_AS_STRING(name), self.name,
+                               self.name_len) == 0):
+                    self.current = idx
+                    break
+            else:
+                return
+
+            if self.seen & (1ULL << self.current):
+                # Repeated fields are combined as described in RFC 9110,
+                # section 5.3.
+                siphash_update(&self.headers[self.current], b', ', 2)
+            else:
+                self.seen |= 1ULL << self.current
+                siphash_init(&self.headers[self.current], self.k0, self.k1)
+
+        if self.current >= 0:
+            siphash_update(&self.headers[self.current], at, length)
+
+    cdef void finish(self, const char *method) noexcept:
+        cdef:
+            siphash_t h
+            Py_ssize_t idx
+
+        self.finish_url()
+        siphash_init(&h, self.k0, self.k1)
+        siphash_update(&h, method, strlen(method))
+        siphash_update_u64(&h, siphash_final(&self.url))
+        for idx in range(len(self.names)):
+            if self.seen & (1ULL << idx):
+                siphash_update(&h, b'\x01', 1)
+                siphash_update_u64(&h, siphash_final(&self.headers[idx]))
+            else:
+                siphash_update(&h, b'\x00', 1)
+
+        self.key = siphash_final(&h)
+        self.ready = True
+
+
+cdef enum _HeaderState:
+    HEADER_NONE
+    HEADER_FIELD
+    HEADER_VALUE
+
+
+cdef enum _SpanKind:
+    SPAN_NONE
+    SPAN_URL
+    SPAN_BODY
+
+
+cdef enum _SpanPause:
+    PAUSE_NONE
+    PAUSE_MESSAGE_BEGIN
+    PAUSE_MESSAGE_COMPLETE
 
 
 @cython.internal
@@ -31,15 +473,54 @@ cdef class HttpParser:
         cparser.llhttp_t* _cparser
         cparser.llhttp_settings_t* _csettings
 
-        bytes _current_header_name
-        bytes _current_header_value
+        # Scratch buffer accumulating the current header: the name is
+        # stored at [0:name_len], the value right after it.  It is kept
+        # across messages so keep-alive connections allocate it once.
+        char* _header_buf
+        size_t _header_buf_size
+        size_t _header_name_len
+        size_t _header_value_len
+        _HeaderState _header_state
+
+        # Reason phrase of the current response.
+        char* _reason_buf
+        size_t _reason_buf_size
+        size_t _reason_len
 
         _proto_on_url, _proto_on_status, _proto_on_body, \
         _proto_on_header, _proto_on_headers_complete, \
         _proto_on_message_complete, _proto_on_chunk_header, \
         _proto_on_chunk_complete, _proto_on_message_begin
 
+        # Span callbacks used by feed_file(spans=True).  While it runs,
+        # _span_base is the start of the mapping and every position
+        # reported is a file offset.  Adjacent url and body fragments
+        # are coalesced into [_span_start, _span_end) and reported when
+        # the next callback arrives.
+        _proto_on_url_span, _proto_on_header_span, _proto_on_body_span, \
+        _proto_on_message_span
+        const char* _span_base
+        _SpanKind _span_kind
+        Py_ssize_t _span_start
+        Py_ssize_t _span_end
+        Py_ssize_t _header_name_start
+        Py_ssize_t _header_name_end
+        Py_ssize_t _header_value_start
+        Py_ssize_t _header_value_end
+        _SpanPause _span_pause
+        Py_ssize_t _message_start
+        Py_ssize_t _file_offset
+
         object _last_error
+        Py_ssize_t _error_pos
+
+        _CacheKey _cache_key
+        _BodyDecoder _decoder
+
+        object _multipart_protocol
+        bint _multipart_zero_copy
+        bytes _content_type
+        MultipartParser _multipart
 
         Py_buffer py_buf
 
@@ -54,9 +535,17 @@ cdef class HttpParser:
         if self._csettings is NULL:
             raise MemoryError()
 
+        self._header_buf = NULL
+        self._header_buf_size = 0
+        self._reason_buf = NULL
+        self._reason_buf_size = 0
+        self._span_base = NULL
+
     def __dealloc__(self):
         PyMem_Free(self._cparser)
         PyMem_Free(self._csettings)
+        PyMem_Free(self._header_buf)
+        PyMem_Free(self._reason_buf)
 
     cdef _init(self, protocol, cparser.llhttp_type_t mode):
         cparser.llhttp_settings_init(self._csettings)
@@ -64,8 +553,10 @@ cdef class HttpParser:
         cparser.llhttp_init(self._cparser, mode, self._csettings)
         self._cparser.data = <void*>self
 
-        self._current_header_name = None
-        self._current_header_value = None
+        self._header_name_len = 0
+        self._header_value_len = 0
+        self._header_state = HEADER_NONE
+        self._reason_len = 0
 
         self._proto_on_header = getattr(protocol, 'on_header', None)
         if self._proto_on_header is not None:
@@ -97,42 +588,157 @@ cdef class HttpParser:
             protocol, 'on_chunk_complete', None)
         self._csettings.on_chunk_complete = cb_on_chunk_complete
 
+        # Only installed by feed_file(spans=True).
+        self._proto_on_url_span = getattr(protocol, 'on_url_span', None)
+        self._proto_on_header_span = getattr(protocol, 'on_header_span', None)
+        self._proto_on_body_span = getattr(protocol, 'on_body_span', None)
+        self._proto_on_message_span = getattr(
+            protocol, 'on_message_span', None)
+        self._span_kind = SPAN_NONE
+        self._span_pause = PAUSE_NONE
+        self._message_start = -1
+        self._file_offset = 0
+
         self._last_error = None
+        self._error_pos = -1
+        self._cache_key = None
+        self._decoder = None
+        self._multipart_protocol = None
+        self._content_type = None
+        self._multipart = None
 
     cdef _maybe_call_on_header(self):
-        if self._current_header_value is not None:
-            current_header_name = self._current_header_name
-            current_header_value = self._current_header_value
-
-            self._current_header_name = self._current_header_value = None
-
-            if self._proto_on_header is not None:
-                self._proto_on_header(current_header_name,
-                                      current_header_value)
-
-    cdef _on_header_field(self, bytes field):
+        cdef:
+            char* buf = self._header_buf
+            size_t name_len = self._header_name_len
+            size_t value_len = self._header_value_len
+            size_t i
+
+        if self._header_state != HEADER_VALUE:
+            return
+
+        self._header_name_len = self._header_value_len = 0
+        self._header_state = HEADER_NONE
+
+        if self._decoder is not None and name_len == 16:
+            for i in range(16):
+                if _ascii_lower(buf[i]) != (<char*>b'content-encoding')[i]:
+                    break
+            else:
+                self._decoder.set_encoding(PyBytes_FromStringAndSize(
+                    buf + name_len, <Py_ssize_t>value_len))
+
+        if self._multipart_protocol is not None and name_len == 12:
+            for i in range(12):
+                if _ascii_lower(buf[i]) != (<char*>b'content-type')[i]:
+                    break
+            else:
+                self._content_type = PyBytes_FromStringAndSize(
+                    buf + name_len, <Py_ssize_t>value_len)
+
+        if (self._span_base is not NULL and
+                self._proto_on_header_span is not None):
+            self._proto_on_header_span(
+                self._header_name_start,
+                self._header_name_end - self._header_name_start,
+                self._header_value_start,
+                self._header_value_end - self._header_value_start)
+        elif self._proto_on_header is not None:
+            current_header_name = PyBytes_FromStringAndSize(
+                buf, <Py_ssize_t>name_len)
+            current_header_value = PyBytes_FromStringAndSize(
+                buf + name_len, <Py_ssize_t>value_len)
+            self._proto_on_header(current_header_name,
+                                  current_header_value)
+
+    cdef _append_header_data(self, const char *at, size_t length):
+        cdef size_t used = self._header_name_len + self._header_value_len
+
+        if used + length > self._header_buf_size:
+            self._header_buf = _grow_buffer(
+                self._header_buf, &self._header_buf_size, used + length)
+        memcpy(self._header_buf + used, at, length)
+
+    cdef _on_header_field(self, const char *at, size_t length):
         self._maybe_call_on_header()
-        if self._current_header_name is None:
-            self._current_header_name = field
+        if self._span_base is not NULL:
+            if self._header_state != HEADER_FIELD:
+                self._header_name_start = at - self._span_base
+            self._header_name_end = at + length - self._span_base
+        self._append_header_data(at, length)
+        self._header_name_len += length
+        self._header_state = HEADER_FIELD
+
+    cdef _on_header_value(self, const char *at, size_t length):
+        if self._span_base is not NULL:
+            if self._header_state != HEADER_VALUE:
+                self._header_value_start = at - self._span_base
+            self._header_value_end = at + length - self._span_base
+        self._append_header_data(at, length)
+        self._header_value_len += length
+        self._header_state = HEADER_VALUE
+
+    cdef _add_span(self, _SpanKind kind, const char *at, size_t length):
+        cdef Py_ssize_t start = at - self._span_base
+
+        if self._span_kind == kind and self._span_end == start:
+            self._span_end += <Py_ssize_t>length
+            return
+
+        self._flush_span()
+        self._span_kind = kind
+        self._span_start = start
+        self._span_end = start + <Py_ssize_t>length
+
+    cdef _flush_span(self):
+        cdef _SpanKind kind = self._span_kind
+
+        if kind == SPAN_NONE:
+            return
+        self._span_kind = SPAN_NONE
+        if kind == SPAN_URL:
+            self._proto_on_url_span(
+                self._span_start, self._span_end - self._span_start)
         else:
-            self._current_header_name += field
+            self._proto_on_body_span(
+                self._span_start, self._span_end - self._span_start)
 
-    cdef _on_header_value(self, bytes val):
-        if self._current_header_value is None:
-            self._current_header_value = val
+    cdef _on_span_pause(self, Py_ssize_t offset):
+        cdef:
+            _SpanPause pause = self._span_pause
+            Py_ssize_t start
+
+        self._span_pause = PAUSE_NONE
+        if pause == PAUSE_MESSAGE_BEGIN:
+            self._message_start = offset
         else:
-            # This is unlikely, as mostly HTTP headers are one-line
-            self._current_header_value += val
+            start = self._message_start
+            self._message_start = -1
+            self._proto_on_message_span(start, offset - start)
 
     cdef _on_headers_complete(self):
         self._maybe_call_on_header()
 
+        if self._cache_key is not None:
+            self._cache_key.finish(cparser.llhttp_method_name(
+                <cparser.llhttp_method_t> self._cparser.method))
+
+        if self._decoder is not None:
+            self._decoder.start()
+
+        if self._content_type is not None:
+            boundary = boundary_from_content_type(self._content_type)
+            self._content_type = None
+            if boundary is not None:
+                self._multipart = MultipartParser(
+                    boundary, self._multipart_protocol,
+                    zero_copy=self._multipart_zero_copy)
+
         if self._proto_on_headers_complete is not None:
             self._proto_on_headers_complete()
 
     cdef _on_chunk_header(self):
-        if (self._current_header_value is not None or
-            self._current_header_name is not None):
+        if self._header_state != HEADER_NONE:
             raise HttpParserError('invalid headers state')
 
         if self._proto_on_chunk_header is not None:
@@ -148,16 +754,16 @@ cdef class HttpParser:
 
     def set_dangerous_leniencies(
         self,
-        lenient_headers: Optional[bool] = None,
-        lenient_chunked_length: Optional[bool] = None,
-        lenient_keep_alive: Optional[bool] = None,
-        lenient_transfer_encoding: Optional[bool] = None,
-        lenient_version: Optional[bool] = None,
-        lenient_data_after_close: Optional[bool] = None,
-        lenient_optional_lf_after_cr: Optional[bool] = None,
-        lenient_optional_cr_before_lf: Optional[bool] = None,
-        lenient_optional_crlf_after_chunk: Optional[bool] = None,
-        lenient_spaces_after_chunk_size: Optional[bool] = None,
+        lenient_headers: bool | None = None,
+        lenient_chunked_length: bool | None = None,
+        lenient_keep_alive: bool | None = None,
+        lenient_transfer_encoding: bool | None = None,
+        lenient_version: bool | None = None,
+        lenient_data_after_close: bool | None = None,
+        lenient_optional_lf_after_cr: bool | None = None,
+        lenient_optional_cr_before_lf: bool | None = None,
+        lenient_optional_crlf_after_chunk: bool | None = None,
+        lenient_spaces_after_chunk_size: bool | None = None,
     ):
         cdef cparser.llhttp_t* parser = self._cparser
         if lenient_headers is not None:
@@ -191,6 +797,35 @@ cdef class HttpParser:
             cparser.llhttp_set_lenient_spaces_after_chunk_size(
                 parser, lenient_spaces_after_chunk_size)
 
+    def enable_content_decoding(self, max_size=None,
+                                Py_ssize_t block_size=DECODED_BLOCK_SIZE):
+        if self._proto_on_body is None:
+            raise TypeError('content decoding requires an on_body callback')
+        if max_size is not None and max_size < 0:
+            raise ValueError('max_size must not be negative')
+        if block_size <= 0:
+            raise ValueError('block_size must be positive')
+
+        self._decoder = _BodyDecoder(self._proto_on_body, max_size, block_size)
+
+        self._csettings.on_message_begin = cb_on_message_begin
+        self._csettings.on_header_field = cb_on_header_field
+        self._csettings.on_header_value = cb_on_header_value
+        self._csettings.on_message_complete = cb_on_message_complete
+
+    def enable_multipart(self, protocol, *, zero_copy=False):
+        self._multipart_protocol = protocol
+        self._multipart_zero_copy = zero_copy
+
+        self._csettings.on_message_begin = cb_on_message_begin
+        self._csettings.on_header_field = cb_on_header_field
+        self._csettings.on_header_value = cb_on_header_value
+        self._csettings.on_body = cb_on_body
+        self._csettings.on_message_complete = cb_on_message_complete
+
+    def get_multipart(self):
+        return self._multipart
+
     def get_http_version(self):
         cdef cparser.llhttp_t* parser = self._cparser
         return '{}.{}'.format(parser.http_major, parser.http_minor)
@@ -204,60 +839,226 @@ cdef class HttpParser:
 
     def feed_data(self, data):
         cdef:
-            size_t data_len
-            cparser.llhttp_errno_t err
             Py_buffer *buf
             bint owning_buf = False
-            const char* err_pos
 
         if PyMemoryView_Check(data):
             buf = PyMemoryView_GET_BUFFER(data)
-            data_len = <size_t>buf.len
-            err = cparser.llhttp_execute(
-                self._cparser,
-                <char*>buf.buf,
-                data_len)
-
         else:
             buf = &self.py_buf
             PyObject_GetBuffer(data, buf, PyBUF_SIMPLE)
             owning_buf = True
-            data_len = <size_t>buf.len
-
-            err = cparser.llhttp_execute(
-                self._cparser,
-                <char*>buf.buf,
-                data_len)
 
         try:
-            if self._cparser.upgrade == 1 and err == cparser.HPE_PAUSED_UPGRADE:
-                err_pos = cparser.llhttp_get_error_pos(self._cparser)
+            self._execute(<char*>buf.buf, <size_t>buf.len, <char*>buf.buf)
+        finally:
+            if owning_buf:
+                PyBuffer_Release(buf)
 
-                # Immediately free the parser from "error" state, simulating
-                # http-parser behavior here because 1) we never had the API to
-                # allow users manually "resume after upgrade", and 2) the use
-                # case for resuming parsing is very rare.
-                cparser.llhttp_resume_after_upgrade(self._cparser)
+    def feed_data_status(self, data):
+        cdef:
+            Py_buffer *buf
+            bint owning_buf = False
+            cparser.llhttp_errno_t err
+            Py_ssize_t pos
+            int status
 
-                # The err_pos here is specific for the input buf. So if we ever
-                # switch to the llhttp behavior (re-raise HttpParserUpgrade for
-                # successive calls to feed_data() until resume_after_upgrade is
-                # called), we have to store the result and keep our own state.
-                raise HttpParserUpgrade(err_pos - <char*>buf.buf)
+        if PyMemoryView_Check(data):
+            buf = PyMemoryView_GET_BUFFER(data)
+        else:
+            buf = &self.py_buf
+            PyObject_GetBuffer(data, buf, PyBUF_SIMPLE)
+            owning_buf = True
+
+        try:
+            err = cparser.llhttp_execute(
+                self._cparser, <char*>buf.buf, <size_t>buf.len)
+            if err == cparser.HPE_OK:
+                return FS_OK, 0, -1, buf.len
+
+            pos = cparser.llhttp_get_error_pos(self._cparser) - \
+                <char*>buf.buf
+            if self._cparser.upgrade == 1 and \
+                    err == cparser.HPE_PAUSED_UPGRADE:
+                # Same as in _execute(): parsing ends at the upgrade.
+                cparser.llhttp_resume_after_upgrade(self._cparser)
+                status = FS_UPGRADE
+            elif err == cparser.HPE_PAUSED:
+                status = FS_PAUSED
+            else:
+                status = FS_ERROR
+                self._error_pos = pos
+            return status, <int>err, pos, pos
         finally:
             if owning_buf:
                 PyBuffer_Release(buf)
 
+    def get_error(self):
+        if self._cparser.error == cparser.HPE_OK:
+            return None
+        return self._make_error()
+
+    def get_error_pos(self):
+        return self._error_pos
+
+    def feed_eof(self):
+        cdef:
+            cparser.llhttp_errno_t err
+            bint completes
+            Py_ssize_t start
+
+        if self._cparser.error != cparser.HPE_OK:
+            return
+
+        # A message delimited by the end of the connection is completed
+        # by llhttp_finish(), which calls on_message_complete.
+        completes = self._cparser.finish == cparser.HTTP_FINISH_SAFE_WITH_CB
+        err = cparser.llhttp_finish(self._cparser)
+
+        if err == cparser.HPE_OK:
+            if (completes and self._message_start >= 0 and
+                    self._proto_on_message_span is not None):
+                start = self._message_start
+                self._message_start = -1
+                self._proto_on_message_span(start, self._file_offset - start)
+            return
+
+        if err != cparser.HPE_INVALID_EOF_STATE:
+            # llhttp_finish() returns the result of a failed
+            # on_message_complete as is, without recording an error.
+            err = cparser.HPE_CB_MESSAGE_COMPLETE
+            cparser.llhttp_set_error_reason(
+                self._cparser, "`on_message_complete` callback error")
+        self._cparser.error = err
+
+        ex = self._make_error()
+        self._last_error = None
+        raise ex
+
+    def feed_file(self, file, Py_ssize_t offset=0,
+                  Py_ssize_t stride=FEED_FILE_STRIDE, *, bint spans=False):
+        cdef:
+            Py_buffer buf
+            Py_ssize_t pos
+            size_t length
+
+        import mmap
+
+        if stride <= 0:
+            raise ValueError('stride must be positive')
+
+        if spans:
+            if self._proto_on_url_span is not None:
+                self._csettings.on_url = cb_on_url
+            if self._proto_on_header_span is not None:
+                self._csettings.on_header_field = cb_on_header_field
+                self._csettings.on_header_value = cb_on_header_value
+            if self._proto_on_body_span is not None:
+                self._csettings.on_body = cb_on_body
+            if self._proto_on_message_span is not None:
+                self._csettings.on_message_begin = cb_on_message_begin
+                self._csettings.on_message_complete = cb_on_message_complete
+
+        if isinstance(file, int):
+            fd = file
+            owned_fd = None
+        else:
+            fd = owned_fd = os.open(file, os.O_RDONLY)
+
+        try:
+            size = os.fstat(fd).st_size
+            if offset < 0 or offset > size:
+                raise ValueError(
+                    'offset {} is out of range for a file of {} bytes'
+                    .format(offset, size))
+            if offset == size:
+                return offset
+
+            mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            try:
+                if hasattr(mm, 'madvise'):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+
+                PyObject_GetBuffer(mm, &buf, PyBUF_SIMPLE)
+                if spans:
+                    self._span_base = <char*>buf.buf
+                try:
+                    pos = offset
+                    try:
+                        while pos < buf.len:
+                            length = <size_t>min(stride, buf.len - pos)
+                            # Offsets reported by HttpParserUpgrade are
+                            # relative to the start of the file.
+                            self._execute(<char*>buf.buf + pos, length,
+                                          <char*>buf.buf)
+                            pos += length
+                            PyErr_CheckSignals()
+                    except HttpParserUpgrade:
+                        self._flush_span()
+                        raise
+                    self._flush_span()
+                    if spans:
+                        self._file_offset = pos
+                    return pos
+                finally:
+                    self._span_base = NULL
+                    self._span_kind = SPAN_NONE
+                    PyBuffer_Release(&buf)
+            finally:
+                mm.close()
+        finally:
+            if owned_fd is not None:
+                os.close(owned_fd)
+
+    cdef _execute(self, const char* data, size_t data_len, const char* base):
+        cdef:
+            cparser.llhttp_errno_t err
+            const char* err_pos
+
+        err = cparser.llhttp_execute(self._cparser, data, data_len)
+
+        while err == cparser.HPE_PAUSED and self._span_pause != PAUSE_NONE:
+            # feed_file(spans=True) pauses at message boundaries, which
+            # is the only way to learn their position from llhttp.
+            err_pos = cparser.llhttp_get_error_pos(self._cparser)
+            cparser.llhttp_resume(self._cparser)
+            self._on_span_pause(err_pos - self._span_base)
+            err = cparser.llhttp_execute(
+                self._cparser, err_pos, data_len - <size_t>(err_pos - data))
+
+        if self._cparser.upgrade == 1 and err == cparser.HPE_PAUSED_UPGRADE:
+            err_pos = cparser.llhttp_get_error_pos(self._cparser)
+
+            # Immediately free the parser from "error" state, simulating
+            # http-parser behavior here because 1) we never had the API to
+            # allow users manually "resume after upgrade", and 2) the use
+            # case for resuming parsing is very rare.
+            cparser.llhttp_resume_after_upgrade(self._cparser)
+
+            # The err_pos here is specific for the input buf. So if we ever
+            # switch to the llhttp behavior (re-raise HttpParserUpgrade for
+            # successive calls to feed_data() until resume_after_upgrade is
+            # called), we have to store the result and keep our own state.
+            raise HttpParserUpgrade(err_pos - base)
+
         if err != cparser.HPE_OK:
-            ex = parser_error_from_errno(
-                self._cparser,
-                <cparser.llhttp_errno_t> self._cparser.error)
-            if isinstance(ex, HttpParserCallbackError):
-                if self._last_error is not None:
-                    ex.__context__ = self._last_error
-                    self._last_error = None
+            self._error_pos = cparser.llhttp_get_error_pos(self._cparser) - base
+            ex = self._make_error()
+            self._last_error = None
             raise ex
 
+    cdef _make_error(self):
+        ex = parser_error_from_errno(
+            self._cparser,
+            <cparser.llhttp_errno_t> self._cparser.error)
+        if isinstance(self._last_error, (HttpParserDecodingError,
+                                         HttpParserMultipartError)):
+            ex = self._last_error
+        elif isinstance(ex, HttpParserCallbackError):
+            if self._last_error is not None:
+                ex.__context__ = self._last_error
+        return ex
+
 
 cdef class HttpRequestParser(HttpParser):
 
@@ -272,37 +1073,298 @@ cdef class HttpRequestParser(HttpParser):
         cdef cparser.llhttp_t* parser = self._cparser
         return cparser.llhttp_method_name(<cparser.llhttp_method_t> parser.method)
 
+    def enable_cache_key(self, headers=(), key=None):
+        if key is None:
+            key = _CACHE_KEY_SECRET
+        elif not isinstance(key, bytes) or len(key) != 16:
+            raise ValueError('key must be 16 bytes')
+
+        names = tuple((<bytes?>name).lower() for name in headers)
+        if len(names) > CACHE_KEY_MAX_HEADERS:
+            raise ValueError(
+                'at most {} cache key headers are supported'
+                .format(CACHE_KEY_MAX_HEADERS))
+        for name in names:
+            if len(name) > CACHE_KEY_MAX_NAME:
+                raise ValueError(
+                    'header name {!r} is too long'.format(name))
+
+        self._cache_key = _CacheKey(names, key)
+
+        self._csettings.on_message_begin = cb_on_message_begin
+        self._csettings.on_url = cb_on_url
+        self._csettings.on_header_field = cb_on_header_field
+        self._csettings.on_header_value = cb_on_header_value
+
+    def get_cache_key(self):
+        if self._cache_key is None or not self._cache_key.ready:
+            return None
+        return self._cache_key.key
+
 
 cdef class HttpResponseParser(HttpParser):
 
     def __init__(self, protocol):
         self._init(protocol, cparser.HTTP_RESPONSE)
 
+        # The reason phrase is always recorded natively for
+        # get_status_line(); the Python on_status() callback is only
+        # invoked if the protocol defines it.
         self._proto_on_status = getattr(protocol, 'on_status', None)
-        if self._proto_on_status is not None:
-            self._csettings.on_status = cb_on_status
+        self._csettings.on_status = cb_on_status
+        self._csettings.on_message_begin = cb_on_message_begin
 
     def get_status_code(self):
         cdef cparser.llhttp_t* parser = self._cparser
         return parser.status_code
 
+    def get_status_line(self):
+        cdef:
+            cparser.llhttp_t* parser = self._cparser
+            bytes reason
+
+        reason = _standard_reason(parser.status_code)
+        if (reason is None or
+                <size_t>len(reason) != self._reason_len or
+                memcmp(PyBytes_AS_STRING(reason), self._reason_buf,
+                       self._reason_len) != 0):
+            reason = PyBytes_FromStringAndSize(
+                self._reason_buf, <Py_ssize_t>self._reason_len)
+
+        return ((parser.http_major, parser.http_minor),
+                parser.status_code,
+                reason)
+
+
+cdef class RequestHead:
+    cdef readonly bytes method
+    cdef readonly bytes url
+    cdef readonly str http_version
+    cdef readonly dict headers
+    cdef readonly Py_ssize_t body_offset
+
+    cdef dict _parsed
+
+    def __cinit__(self, bytes method, bytes url, str http_version,
+                  dict headers, Py_ssize_t body_offset):
+        self.method = method
+        self.url = url
+        self.http_version = http_version
+        self.headers = headers
+        self.body_offset = body_offset
+        self._parsed = {}
+
+    def get_cookies(self):
+        cdef bytes value
+
+        result = self._parsed.get(b'cookie')
+        if result is None:
+            value = self.headers.get(b'cookie')
+            if value is None:
+                return None
+            result = self._parsed[b'cookie'] = cookies_from_bytes(
+                PyBytes_AS_STRING(value), len(value))
+        return result
+
+    def get_content_type(self):
+        cdef bytes value
+
+        result = self._parsed.get(b'content-type')
+        if result is None:
+            value = self.headers.get(b'content-type')
+            if value is None:
+                return None
+            result = self._parsed[b'content-type'] = content_type_from_bytes(
+                PyBytes_AS_STRING(value), len(value))
+        return result
+
+    def get_accept(self):
+        cdef bytes value
+
+        result = self._parsed.get(b'accept')
+        if result is None:
+            value = self.headers.get(b'accept')
+            if value is None:
+                return None
+            result = self._parsed[b'accept'] = accept_from_bytes(
+                PyBytes_AS_STRING(value), len(value))
+        return result
+
+    def get_host(self):
+        cdef bytes value
+
+        result = self._parsed.get(b'host')
+        if result is None:
+            value = self.headers.get(b'host')
+            if value is None:
+                return None
+            result = self._parsed[b'host'] = host_from_bytes(
+                PyBytes_AS_STRING(value), len(value))
+        return result
+
+    def __repr__(self):
+        return ('<RequestHead method: {!r}, url: {!r}, http_version: {!r}, '
+                'headers: {!r}, body_offset: {!r}>'
+                .format(self.method, self.url, self.http_version,
+                        self.headers, self.body_offset))
+
+
+@cython.internal
+cdef class _HeadScanner:
+
+    cdef:
+        const char* _url_at
+        size_t _url_len
+
+        tuple _wanted
+        Py_ssize_t _current
+
+        dict headers
+
+    def __cinit__(self, tuple wanted):
+        self._url_at = NULL
+        self._url_len = 0
+        self._wanted = wanted
+        self._current = -1
+        self.headers = {}
+
+    cdef _on_header_field(self, const char *at, size_t length):
+        cdef:
+            bytes name
+            const char *name_at
+            size_t i
+            Py_ssize_t idx
+
+        self._current = -1
+        for idx in range(len(self._wanted)):
+            name = <bytes>self._wanted[idx]
+            if <size_t>len(name) != length:
+                continue
+            name_at = PyBytes_AS_STRING(name)
+            for i in range(length):
+                if _ascii_lower(at[i]) != name_at[i]:
+                    break
+            else:
+                self._current = idx
+                return
+
+    cdef _on_header_value(self, const char *at, size_t length):
+        cdef bytes name
+
+        if self._current < 0:
+            return
+
+        name = <bytes>self._wanted[self._current]
+        self._current = -1
+
+        prev = self.headers.get(name)
+        if prev is None:
+            self.headers[name] = at[:length]
+        elif name == b'cookie':
+            # Cookie lines are combined with '; ' instead (RFC 6265,
+            # section 5.4).
+            self.headers[name] = prev + b'; ' + at[:length]
+        else:
+            # Repeated fields are combined as described in RFC 9110,
+            # section 5.3.
+            self.headers[name] = prev + b', ' + at[:length]
+
+
+def parse_request_head(data, wanted_headers=()):
+    cdef:
+        cparser.llhttp_t cparser_
+        cparser.llhttp_settings_t csettings
+        cparser.llhttp_errno_t err
+        Py_buffer py_buf
+        _HeadScanner scanner
+        Py_ssize_t body_offset
+
+    scanner = _HeadScanner(
+        tuple((<bytes?>name).lower() for name in wanted_headers))
+
+    cparser.llhttp_settings_init(&csettings)
+    csettings.on_url = cb_scan_on_url
+    if scanner._wanted:
+        csettings.on_header_field = cb_scan_on_header_field
+        csettings.on_header_value = cb_scan_on_header_value
+    csettings.on_headers_complete = cb_scan_on_headers_complete
+    csettings.on_body = cb_scan_on_body
+    csettings.on_chunk_header = cb_scan_on_body_start
+    csettings.on_message_complete = cb_scan_on_body_start
+
+    cparser.llhttp_init(&cparser_, cparser.HTTP_REQUEST, &csettings)
+    cparser_.data = <void*>scanner
+
+    PyObject_GetBuffer(data, &py_buf, PyBUF_SIMPLE)
+    try:
+        err = cparser.llhttp_execute(
+            &cparser_, <char*>py_buf.buf, <size_t>py_buf.len)
+
+        if err == cparser.HPE_OK:
+            raise HttpParserIncomplete(py_buf.len)
+
+        if err != cparser.HPE_PAUSED:
+            raise parser_error_from_errno(&cparser_, err)
+
+        body_offset = cparser.llhttp_get_error_pos(&cparser_) - \
+            <char*>py_buf.buf
+
+        # llhttp checks how the body is framed (Transfer-Encoding,
+        # Content-Length) only after on_headers_complete, so continue
+        # until the body or the end of the message, to reject exactly
+        # what HttpRequestParser rejects.
+        cparser.llhttp_resume(&cparser_)
+        err = cparser.llhttp_execute(
+            &cparser_, <char*>py_buf.buf + body_offset,
+            <size_t>(py_buf.len - body_offset))
+        if err != cparser.HPE_OK and err != cparser.HPE_PAUSED:
+            raise parser_error_from_errno(&cparser_, err)
+
+        return RequestHead(
+            cparser.llhttp_method_name(
+                <cparser.llhttp_method_t> cparser_.method),
+            scanner._url_at[:scanner._url_len],
+            '{}.{}'.format(cparser_.http_major, cparser_.http_minor),
+            scanner.headers,
+            body_offset)
+    finally:
+        PyBuffer_Release(&py_buf)
+
 
 cdef int cb_on_message_begin(cparser.llhttp_t* parser) except -1:
     cdef HttpParser pyparser = <HttpParser>parser.data
+    pyparser._reason_len = 0
+    if pyparser._cache_key is not None:
+        pyparser._cache_key.reset()
+    if pyparser._decoder is not None:
+        pyparser._decoder.reset()
+    pyparser._content_type = None
+    pyparser._multipart = None
     try:
-        pyparser._proto_on_message_begin()
+        pyparser._flush_span()
+        if pyparser._proto_on_message_begin is not None:
+            pyparser._proto_on_message_begin()
     except BaseException as ex:
         pyparser._last_error = ex
         return -1
-    else:
-        return 0
+    if (pyparser._span_base is not NULL and
+            pyparser._proto_on_message_span is not None):
+        pyparser._span_pause = PAUSE_MESSAGE_BEGIN
+        return cparser.HPE_PAUSED
+    return 0
 
 
 cdef int cb_on_url(cparser.llhttp_t* parser,
                    const char *at, size_t length) except -1:
     cdef HttpParser pyparser = <HttpParser>parser.data
+    if pyparser._cache_key is not None:
+        pyparser._cache_key.on_url(at, length)
     try:
-        pyparser._proto_on_url(at[:length])
+        if (pyparser._span_base is not NULL and
+                pyparser._proto_on_url_span is not None):
+            pyparser._add_span(SPAN_URL, at, length)
+        elif pyparser._proto_on_url is not None:
+            pyparser._proto_on_url(at[:length])
     except BaseException as ex:
         cparser.llhttp_set_error_reason(parser, "`on_url` callback error")
         pyparser._last_error = ex
@@ -315,7 +1377,16 @@ cdef int cb_on_status(cparser.llhttp_t* parser,
                       const char *at, size_t length) except -1:
     cdef HttpParser pyparser = <HttpParser>parser.data
     try:
-        pyparser._proto_on_status(at[:length])
+        pyparser._flush_span()
+        if pyparser._reason_len + length > pyparser._reason_buf_size:
+            pyparser._reason_buf = _grow_buffer(
+                pyparser._reason_buf, &pyparser._reason_buf_size,
+                pyparser._reason_len + length)
+        memcpy(pyparser._reason_buf + pyparser._reason_len, at, length)
+        pyparser._reason_len += length
+
+        if pyparser._proto_on_status is not None:
+            pyparser._proto_on_status(at[:length])
     except BaseException as ex:
         cparser.llhttp_set_error_reason(parser, "`on_status` callback error")
         pyparser._last_error = ex
@@ -327,8 +1398,15 @@ cdef int cb_on_status(cparser.llhttp_t* parser,
 cdef int cb_on_header_field(cparser.llhttp_t* parser,
                             const char *at, size_t length) except -1:
     cdef HttpParser pyparser = <HttpParser>parser.data
+    if pyparser._cache_key is not None:
+        pyparser._cache_key.on_header_field(at, length)
+    if (pyparser._proto_on_header is None and pyparser._decoder is None and
+            pyparser._multipart_protocol is None and
+            pyparser._span_base is NULL):
+        return 0
     try:
-        pyparser._on_header_field(at[:length])
+        pyparser._flush_span()
+        pyparser._on_header_field(at, length)
     except BaseException as ex:
         cparser.llhttp_set_error_reason(parser, "`on_header_field` callback error")
         pyparser._last_error = ex
@@ -340,8 +1418,14 @@ cdef int cb_on_header_field(cparser.llhttp_t* parser,
 cdef int cb_on_header_value(cparser.llhttp_t* parser,
                             const char *at, size_t length) except -1:
     cdef HttpParser pyparser = <HttpParser>parser.data
+    if pyparser._cache_key is not None:
+        pyparser._cache_key.on_header_value(at, length)
+    if (pyparser._proto_on_header is None and pyparser._decoder is None and
+            pyparser._multipart_protocol is None and
+            pyparser._span_base is NULL):
+        return 0
     try:
-        pyparser._on_header_value(at[:length])
+        pyparser._on_header_value(at, length)
     except BaseException as ex:
         cparser.llhttp_set_error_reason(parser, "`on_header_value` callback error")
         pyparser._last_error = ex
@@ -353,6 +1437,7 @@ cdef int cb_on_header_value(cparser.llhttp_t* parser,
 cdef int cb_on_headers_complete(cparser.llhttp_t* parser) except -1:
     cdef HttpParser pyparser = <HttpParser>parser.data
     try:
+        pyparser._flush_span()
         pyparser._on_headers_complete()
     except BaseException as ex:
         pyparser._last_error = ex
@@ -368,7 +1453,15 @@ cdef int cb_on_body(cparser.llhttp_t* parser,
                     const char *at, size_t length) except -1:
     cdef HttpParser pyparser = <HttpParser>parser.data
     try:
-        pyparser._proto_on_body(at[:length])
+        if pyparser._decoder is not None and pyparser._decoder.active():
+            pyparser._decoder.feed(at, length)
+        elif pyparser._multipart is not None:
+            pyparser._multipart._feed(at, length)
+        elif (pyparser._span_base is not NULL and
+                pyparser._proto_on_body_span is not None):
+            pyparser._add_span(SPAN_BODY, at, length)
+        elif pyparser._proto_on_body is not None:
+            pyparser._proto_on_body(at[:length])
     except BaseException as ex:
         cparser.llhttp_set_error_reason(parser, "`on_body` callback error")
         pyparser._last_error = ex
@@ -378,19 +1471,33 @@ cdef int cb_on_body(cparser.llhttp_t* parser,
 
 
 cdef int cb_on_message_complete(cparser.llhttp_t* parser) except -1:
-    cdef HttpParser pyparser = <HttpParser>parser.data
+    cdef:
+        HttpParser pyparser = <HttpParser>parser.data
+        MultipartParser multipart
     try:
-        pyparser._proto_on_message_complete()
+        pyparser._flush_span()
+        if pyparser._decoder is not None:
+            pyparser._decoder.finish()
+        if pyparser._multipart is not None:
+            multipart = pyparser._multipart
+            pyparser._multipart = None
+            multipart._finish()
+        if pyparser._proto_on_message_complete is not None:
+            pyparser._proto_on_message_complete()
     except BaseException as ex:
         pyparser._last_error = ex
         return -1
-    else:
-        return 0
+    if (pyparser._span_base is not NULL and
+            pyparser._proto_on_message_span is not None):
+        pyparser._span_pause = PAUSE_MESSAGE_COMPLETE
+        return cparser.HPE_PAUSED
+    return 0
 
 
 cdef int cb_on_chunk_header(cparser.llhttp_t* parser) except -1:
     cdef HttpParser pyparser = <HttpParser>parser.data
     try:
+        pyparser._flush_span()
         pyparser._on_chunk_header()
     except BaseException as ex:
         pyparser._last_error = ex
@@ -402,6 +1509,7 @@ cdef int cb_on_chunk_header(cparser.llhttp_t* parser) except -1:
 cdef int cb_on_chunk_complete(cparser.llhttp_t* parser) except -1:
     cdef HttpParser pyparser = <HttpParser>parser.data
     try:
+        pyparser._flush_span()
         pyparser._on_chunk_complete()
     except BaseException as ex:
         pyparser._last_error = ex
@@ -410,6 +1518,122 @@ cdef int cb_on_chunk_complete(cparser.llhttp_t* parser) except -1:
         return 0
 
 
+cdef int cb_scan_on_url(cparser.llhttp_t* parser,
+                        const char *at, size_t length) except -1:
+    cdef _HeadScanner scanner = <_HeadScanner>parser.data
+    # The whole head is parsed in one llhttp_execute() call, so the
+    # URL is always reported as a single span.
+    scanner._url_at = at
+    scanner._url_len = length
+    return 0
+
+
+cdef int cb_scan_on_header_field(cparser.llhttp_t* parser,
+                                 const char *at, size_t length) except -1:
+    cdef _HeadScanner scanner = <_HeadScanner>parser.data
+    try:
+        scanner._on_header_field(at, length)
+    except BaseException:
+        cparser.llhttp_set_error_reason(parser, "`on_header_field` callback error")
+        return cparser.HPE_USER
+    else:
+        return 0
+
+
+cdef int cb_scan_on_header_value(cparser.llhttp_t* parser,
+                                 const char *at, size_t length) except -1:
+    cdef _HeadScanner scanner = <_HeadScanner>parser.data
+    try:
+        scanner._on_header_value(at, length)
+    except BaseException:
+        cparser.llhttp_set_error_reason(parser, "`on_header_value` callback error")
+        return cparser.HPE_USER
+    else:
+        return 0
+
+
+cdef int cb_scan_on_headers_complete(cparser.llhttp_t* parser) except -1:
+    # Stop right after the head; error_pos then points at the body.
+    return cparser.HPE_PAUSED
+
+
+cdef int cb_scan_on_body(cparser.llhttp_t* parser,
+                         const char *at, size_t length) except -1:
+    return cparser.HPE_PAUSED
+
+
+cdef int cb_scan_on_body_start(cparser.llhttp_t* parser) except -1:
+    # The framing of the body has been checked; nothing after the head
+    # is parsed.
+    return cparser.HPE_PAUSED
+
+
+cdef char* _grow_buffer(char* buf, size_t* size, size_t needed) except NULL:
+    cdef size_t new_size = size[0]
+
+    if new_size < BUF_MIN_SIZE:
+        new_size = BUF_MIN_SIZE
+    while new_size < needed:
+        new_size *= 2
+
+    buf = <char*>PyMem_Realloc(buf, new_size)
+    if buf is NULL:
+        raise MemoryError()
+    size[0] = new_size
+    return buf
+
+
+_STANDARD_REASONS = None
+
+
+cdef bytes _standard_reason(int status_code):
+    # Reason phrases of the registered status codes, shared between
+    # all responses.  Built on first use to keep the import cheap; the
+    # table is only published once complete, so threads racing on the
+    # first call at worst build it twice.
+    global _STANDARD_REASONS
+
+    if _STANDARD_REASONS is None:
+        import http
+        _STANDARD_REASONS = {
+            status.value: status.phrase.encode('latin-1')
+            for status in http.HTTPStatus
+        }
+    return _STANDARD_REASONS.get(status_code)
+
+
+cdef inline char _ascii_lower(char c) noexcept:
+    if c >= b'A' and c <= b'Z':
+        return c + 32
+    return c
+
+
+cdef inline char _ascii_upper(char c) noexcept:
+    if c >= b'a' and c <= b'z':
+        return c - 32
+    return c
+
+
+cdef inline bint _scheme_char(char c, size_t pos) noexcept:
+    # RFC 3986, section 3.1.
+    if pos >= CACHE_KEY_MAX_SCHEME:
+        return False
+    if c'a' <= c <= c'z' or c'A' <= c <= c'Z':
+        return True
+    return pos > 0 and (c'0' <= c <= c'9' or c == c'+' or c == c'-' or
+                        c == c'.')
+
+
+cdef inline int _hex_value(char c) noexcept:
+    if c'0' <= c <= c'9':
+        return c - c'0'
+    if c'a' <= c <= c'f':
+        return c - c'a' + 10
+    if c'A' <= c <= c'F':
+        return c - c'A' + 10
+    return -1
+
+
 cdef parser_error_from_errno(cparser.llhttp_t* parser, cparser.llhttp_errno_t errno):
     cdef bytes reason = cparser.llhttp_get_error_reason(parser)
 
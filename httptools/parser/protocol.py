@@ -13,3 +13,11 @@ class HTTPProtocol(Protocol):
     def on_chunk_header(self) -> None: ...
     def on_chunk_complete(self) -> None: ...
     def on_status(self, status: bytes) -> None: ...
+    # Only called by feed_file(spans=True), with file offsets.
+    def on_url_span(self, offset: int, length: int) -> None: ...
+    def on_header_span(
+        self, name_offset: int, name_length: int,
+        value_offset: int, value_length: int,
+    ) -> None: ...
+    def on_body_span(self, offset: int, length: int) -> None: ...
+    def on_message_span(self, offset: int, length: int) -> None: ...
@@ -4,3 +4,6 @@ cimport cpython
 cdef extern from "Python.h":
     cpython.Py_buffer* PyMemoryView_GET_BUFFER(object)
     bint PyMemoryView_Check(object)
+    object PyMemoryView_FromMemory(char *mem, Py_ssize_t size, int flags)
+
+    int PyBUF_READ
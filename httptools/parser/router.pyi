@@ -0,0 +1,33 @@
+from array import array
+from typing import Iterable
+
+_Buffer = bytes | bytearray | memoryview | array[int]
+_Match = tuple[int, tuple[tuple[int, int], ...]]
+
+class Router:
+    def __init__(self, routes: Iterable[bytes]) -> None:
+        """Compile route patterns into a radix tree.
+
+        The ID of a route is its index in ``routes``.  A pattern
+        consists of static text and parameters spanning whole path
+        segments: ``{name}`` matches one non-empty segment, and a
+        final ``{name*}`` matches the rest of the path.  Static text
+        takes precedence over parameters, and parameters over
+        wildcards.
+        """
+
+    def param_names(self, route_id: int) -> tuple[bytes, ...]:
+        """Return the parameter names of a route, in pattern order."""
+
+    def match(self, path: _Buffer) -> _Match | None:
+        """Match a path.
+
+        Returns ``(route_id, captures)`` where ``captures`` holds the
+        ``(start, end)`` offsets of every parameter value in ``path``,
+        or ``None`` if no route matches.
+        """
+
+    def match_url(self, url: _Buffer) -> _Match | None:
+        """Like ``match()``, but for the path of a request target as
+        passed to ``on_url``; offsets are relative to ``url``.  An
+        absolute-form target with an empty path matches ``/``."""
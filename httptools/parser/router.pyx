@@ -0,0 +1,303 @@
+#cython: language_level=3
+
+from __future__ import print_function
+from cpython cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE, \
+                     Py_buffer, PyBytes_AS_STRING
+from libc.string cimport memchr, memcmp
+
+cimport cython
+
+
+__all__ = ('Router',)
+
+DEF MAX_PARAMS = 32
+
+
+@cython.final
+@cython.internal
+cdef class _Node:
+    # A radix tree node.  ``label`` is the static prefix consumed when
+    # entering the node; static children are looked up by the first
+    # byte of their label, which is stored at the same index in
+    # ``first``.
+
+    cdef:
+        bytes label
+        bytes first
+        list children
+        _Node param
+        Py_ssize_t route
+        Py_ssize_t wildcard
+
+    def __cinit__(self, bytes label):
+        self.label = label
+        self.first = b''
+        self.children = []
+        self.param = None
+        self.route = -1
+        self.wildcard = -1
+
+    cdef _Node child(self, char c):
+        cdef const char* p = <const char*>memchr(
+            PyBytes_AS_STRING(self.first), c, len(self.first))
+        if p is NULL:
+            return None
+        return <_Node>self.children[p - PyBytes_AS_STRING(self.first)]
+
+    cdef _Node insert(self, bytes label):
+        # Descend along ``label``, splitting nodes as needed, and return
+        # the node reached after consuming it.
+        cdef:
+            _Node node = self
+            _Node child, mid
+            Py_ssize_t i, k, n
+
+        while label:
+            child = node.child(label[0])
+            if child is None:
+                child = _Node(label)
+                node.first += label[:1]
+                node.children.append(child)
+                return child
+
+            n = min(len(child.label), len(label))
+            k = 1
+            while k < n and child.label[k] == label[k]:
+                k += 1
+
+            if k < len(child.label):
+                mid = _Node(child.label[:k])
+                child.label = child.label[k:]
+                mid.first = child.label[:1]
+                mid.children.append(child)
+                i = node.children.index(child)
+                node.children[i] = mid
+                child = mid
+
+            node = child
+            label = label[k:]
+
+        return node
+
+
+cdef Py_ssize_t _match_node(_Node node, const char* at, size_t pos,
+                            size_t end, Py_ssize_t* caps,
+                            int ncap) except -2:
+    cdef:
+        _Node child
+        size_t n
+        const char* seg_end
+        Py_ssize_t route
+
+    if pos == end:
+        if node.route >= 0:
+            return node.route
+        if node.wildcard >= 0:
+            caps[2 * ncap] = <Py_ssize_t>pos
+            caps[2 * ncap + 1] = <Py_ssize_t>end
+            return node.wildcard
+        return -1
+
+    # Static segments take precedence over parameters, which take
+    # precedence over wildcards; the alternatives are only tried when
+    # the more specific branch does not lead to a route.
+    child = node.child(at[pos])
+    if child is not None:
+        n = <size_t>len(child.label)
+        if end - pos >= n and memcmp(
+                at + pos, PyBytes_AS_STRING(child.label), n) == 0:
+            route = _match_node(child, at, pos + n, end, caps, ncap)
+            if route >= 0:
+                return route
+
+    if node.param is not None and at[pos] != b'/':
+        seg_end = <const char*>memchr(at + pos, b'/', end - pos)
+        n = end if seg_end is NULL else <size_t>(seg_end - at)
+        caps[2 * ncap] = <Py_ssize_t>pos
+        caps[2 * ncap + 1] = <Py_ssize_t>n
+        route = _match_node(node.param, at, n, end, caps, ncap + 1)
+        if route >= 0:
+            return route
+
+    if node.wildcard >= 0:
+        caps[2 * ncap] = <Py_ssize_t>pos
+        caps[2 * ncap + 1] = <Py_ssize_t>end
+        return node.wildcard
+
+    return -1
+
+
+cdef list _tokenize(bytes pattern):
+    # Split a route pattern into static byte strings and
+    # ``(name, is_wildcard)`` tuples for its parameters.
+    cdef:
+        list tokens = []
+        Py_ssize_t pos = 0, start, close
+        bytes name
+
+    while True:
+        start = pattern.find(b'{', pos)
+        if start < 0:
+            if pos < len(pattern):
+                tokens.append(pattern[pos:])
+            return tokens
+
+        close = pattern.find(b'}', start)
+        if close < 0:
+            raise ValueError(
+                'unterminated parameter in route {!r}'.format(pattern))
+        if ((start > 0 and pattern[start - 1] != 0x2f) or
+                (close + 1 < len(pattern) and pattern[close + 1] != 0x2f)):
+            raise ValueError(
+                'parameters must span a whole path segment in route '
+                '{!r}'.format(pattern))
+
+        if start > pos:
+            tokens.append(pattern[pos:start])
+
+        name = pattern[start + 1:close]
+        if name.endswith(b'*'):
+            if close + 1 != len(pattern):
+                raise ValueError(
+                    'a wildcard must be the last segment of route '
+                    '{!r}'.format(pattern))
+            tokens.append((name[:-1], True))
+        else:
+            tokens.append((name, False))
+
+        pos = close + 1
+
+
+@cython.final
+cdef class Router:
+
+    cdef:
+        _Node _root
+        list _params
+
+    def __init__(self, routes):
+        cdef:
+            _Node node
+            Py_ssize_t route_id
+            bytes pattern
+            list tokens, names
+            bint last_wildcard
+
+        self._root = _Node(b'')
+        self._params = []
+
+        for route_id, pattern in enumerate(routes):
+            tokens = _tokenize(pattern)
+            names = []
+            node = self._root
+            last_wildcard = False
+
+            for token in tokens:
+                if isinstance(token, bytes):
+                    node = node.insert(token)
+                    continue
+
+                name, last_wildcard = token
+                if not name or name in names:
+                    raise ValueError(
+                        'empty or repeated parameter name in route '
+                        '{!r}'.format(pattern))
+                names.append(name)
+                if len(names) > MAX_PARAMS:
+                    raise ValueError(
+                        'at most {} parameters are supported per route'
+                        .format(MAX_PARAMS))
+
+                if not last_wildcard:
+                    if node.param is None:
+                        node.param = _Node(b'')
+                    node = node.param
+
+            if last_wildcard:
+                if node.wildcard >= 0:
+                    raise ValueError(
+                        'route {!r} duplicates route {}'.format(
+                            pattern, node.wildcard))
+                node.wildcard = route_id
+            else:
+                if node.route >= 0:
+                    raise ValueError(
+                        'route {!r} duplicates route {}'.format(
+                            pattern, node.route))
+                node.route = route_id
+
+            self._params.append(tuple(names))
+
+    cdef _match(self, const char* at, size_t start, size_t end):
+        cdef:
+            Py_ssize_t caps[2 * MAX_PARAMS]
+            Py_ssize_t route
+            Py_ssize_t i
+
+        route = _match_node(self._root, at, start, end, caps, 0)
+        if route < 0:
+            return None
+
+        captures = []
+        for i in range(len(<tuple>self._params[route])):
+            captures.append((caps[2 * i], caps[2 * i + 1]))
+        return route, tuple(captures)
+
+    ### Public API ###
+
+    def param_names(self, Py_ssize_t route_id):
+        return self._params[route_id]
+
+    def match(self, path):
+        cdef Py_buffer py_buf
+
+        PyObject_GetBuffer(path, &py_buf, PyBUF_SIMPLE)
+        try:
+            return self._match(<const char*>py_buf.buf, 0,
+                               <size_t>py_buf.len)
+        finally:
+            PyBuffer_Release(&py_buf)
+
+    def match_url(self, url):
+        cdef:
+            Py_buffer py_buf
+            const char* at
+            const char* p
+            size_t length, start = 0, end
+
+        PyObject_GetBuffer(url, &py_buf, PyBUF_SIMPLE)
+        try:
+            at = <const char*>py_buf.buf
+            length = <size_t>py_buf.len
+
+            if length == 0:
+                return None
+            if at[0] != b'/':
+                # absolute-form (RFC 9112, section 3.2.2): the path
+                # starts after the authority.
+                p = <const char*>memchr(at, b':', length)
+                if (p is NULL or <size_t>(p - at) + 3 > length or
+                        p[1] != b'/' or p[2] != b'/'):
+                    return None
+                start = <size_t>(p - at) + 3
+                while (start < length and at[start] != b'/' and
+                        at[start] != b'?' and at[start] != b'#'):
+                    start += 1
+
+            end = start
+            while end < length and at[end] != b'?' and at[end] != b'#':
+                end += 1
+
+            if start == end:
+                # An empty path is the same as "/" (RFC 3986, section
+                # 6.2.3); captures are then empty spans where the path
+                # would be.
+                result = self._match(b'/', 0, 1)
+                if result is not None:
+                    result = (result[0],
+                              tuple((start, start) for _ in result[1]))
+                return result
+
+            return self._match(at, start, end)
+        finally:
+            PyBuffer_Release(&py_buf)
@@ -0,0 +1,92 @@
+from libc.stdint cimport uint8_t, uint64_t
+
+
+# Incremental SipHash-2-4.  The whole implementation lives in this
+# .pxd as inline functions so that it is compiled into the modules
+# that cimport it.
+
+cdef struct siphash_t:
+    uint64_t v0
+    uint64_t v1
+    uint64_t v2
+    uint64_t v3
+    uint64_t tail
+    size_t ntail
+    size_t total
+
+
+cdef inline uint64_t _rotl(uint64_t x, int b) noexcept nogil:
+    return (x << b) | (x >> (64 - b))
+
+
+cdef inline void _sipround(siphash_t* s) noexcept nogil:
+    s.v0 += s.v1
+    s.v1 = _rotl(s.v1, 13)
+    s.v1 ^= s.v0
+    s.v0 = _rotl(s.v0, 32)
+    s.v2 += s.v3
+    s.v3 = _rotl(s.v3, 16)
+    s.v3 ^= s.v2
+    s.v0 += s.v3
+    s.v3 = _rotl(s.v3, 21)
+    s.v3 ^= s.v0
+    s.v2 += s.v1
+    s.v1 = _rotl(s.v1, 17)
+    s.v1 ^= s.v2
+    s.v2 = _rotl(s.v2, 32)
+
+
+cdef inline void _sipblock(siphash_t* s, uint64_t m) noexcept nogil:
+    s.v3 ^= m
+    _sipround(s)
+    _sipround(s)
+    s.v0 ^= m
+
+
+cdef inline void siphash_init(siphash_t* s,
+                              uint64_t k0, uint64_t k1) noexcept nogil:
+    s.v0 = k0 ^ 0x736f6d6570736575ULL
+    s.v1 = k1 ^ 0x646f72616e646f6dULL
+    s.v2 = k0 ^ 0x6c7967656e657261ULL
+    s.v3 = k1 ^ 0x7465646279746573ULL
+    s.tail = 0
+    s.ntail = 0
+    s.total = 0
+
+
+cdef inline void siphash_update(siphash_t* s, const char* data,
+                                size_t length) noexcept nogil:
+    cdef:
+        const uint8_t* p = <const uint8_t*>data
+        size_t i
+
+    s.total += length
+    for i in range(length):
+        s.tail |= (<uint64_t>p[i]) << (8 * s.ntail)
+        s.ntail += 1
+        if s.ntail == 8:
+            _sipblock(s, s.tail)
+            s.tail = 0
+            s.ntail = 0
+
+
+cdef inline void siphash_update_u64(siphash_t* s, uint64_t v) noexcept nogil:
+    cdef:
+        uint8_t b[8]
+        int i
+
+    for i in range(8):
+        b[i] = <uint8_t>(v >> (8 * i))
+    siphash_update(s, <const char*>b, 8)
+
+
+cdef inline uint64_t siphash_final(const siphash_t* state) noexcept nogil:
+    cdef siphash_t s = state[0]
+
+    _sipblock(&s, s.tail | ((<uint64_t>s.total & 0xff) << 56))
+    s.v2 ^= 0xff
+    _sipround(&s)
+    _sipround(&s)
+    _sipround(&s)
+    _sipround(&s)
+    return s.v0 ^ s.v1 ^ s.v2 ^ s.v3
@@ -0,0 +1,59 @@
+from array import array
+from typing import Protocol
+
+OP_CONTINUATION: int
+OP_TEXT: int
+OP_BINARY: int
+OP_CLOSE: int
+OP_PING: int
+OP_PONG: int
+
+class WebSocketProtocol(Protocol):
+    def on_ws_message_begin(self, opcode: int) -> None: ...
+    def on_ws_message_data(self, data: bytes) -> None: ...
+    def on_ws_message_complete(self) -> None: ...
+    def on_ws_control_frame(self, opcode: int, payload: bytes) -> None: ...
+
+class WebSocketFrameParser:
+    def __init__(
+        self,
+        protocol: WebSocketProtocol | object,
+        *,
+        server_side: bool = True,
+        max_message_size: int | None = None,
+    ) -> None:
+        """The WebSocket (RFC 6455) frame parser.
+
+        Args:
+            protocol (WebSocketProtocol): Callback interface for the parser.
+            server_side (bool): Require masked frames (sent by clients)
+                if ``True``, unmasked ones (sent by servers) otherwise.
+            max_message_size (int): Maximum payload size of a message,
+                checked against frame headers before any data is
+                delivered.
+        """
+
+    def feed_data(self, data: bytes | bytearray | memoryview | array[int]) -> None:
+        """Feed data to the parser.
+
+        Payloads are unmasked and passed to ``on_ws_message_data`` as
+        they arrive; fragmented messages are delivered between
+        ``on_ws_message_begin`` and ``on_ws_message_complete``.  Control
+        frames are delivered whole to ``on_ws_control_frame``, also in
+        the middle of a fragmented message.  Text messages and the
+        reason of close frames must be valid UTF-8, also across
+        fragments, and close codes are checked (RFC 6455, sections
+        5.5.1, 7.4 and 8.1).
+
+        Raises ``HttpParserWebSocketError`` on protocol violations.
+        """
+
+def build_frame(
+    opcode: int,
+    payload: bytes | bytearray | memoryview | array[int] = b"",
+    *,
+    fin: bool = True,
+    mask: bytes | None = None,
+) -> bytes:
+    """Serialize a WebSocket frame, masking the payload with the 4-byte
+    ``mask`` if one is given (required for frames sent by clients)."""
@@ -0,0 +1,458 @@
+#cython: language_level=3
+
+from __future__ import print_function
+
+from cpython cimport PyObject_GetBuffer, PyBuffer_Release, PyBUF_SIMPLE, \
+                     Py_buffer, PyBytes_AS_STRING, PyBytes_FromStringAndSize
+from libc.stdint cimport uint8_t, uint64_t
+from libc.string cimport memcpy
+
+from .errors import HttpParserWebSocketError
+
+cimport cython
+
+
+__all__ = ('WebSocketFrameParser', 'build_frame',
+           'OP_CONTINUATION', 'OP_TEXT', 'OP_BINARY',
+           'OP_CLOSE', 'OP_PING', 'OP_PONG')
+
+cdef enum:
+    WS_OP_CONTINUATION = 0x0
+    WS_OP_TEXT = 0x1
+    WS_OP_BINARY = 0x2
+    WS_OP_CLOSE = 0x8
+    WS_OP_PING = 0x9
+    WS_OP_PONG = 0xA
+
+OP_CONTINUATION = WS_OP_CONTINUATION
+OP_TEXT = WS_OP_TEXT
+OP_BINARY = WS_OP_BINARY
+OP_CLOSE = WS_OP_CLOSE
+OP_PING = WS_OP_PING
+OP_PONG = WS_OP_PONG
+
+DEF MAX_HEADER_LENGTH = 14
+DEF MAX_CONTROL_PAYLOAD = 125
+
+
+cdef enum _FrameState:
+    WS_HEADER
+    WS_PAYLOAD
+
+
+cdef inline void _xor_mask(uint8_t* data, size_t length,
+                           const uint8_t* mask, size_t offset) noexcept nogil:
+    cdef:
+        uint8_t m[8]
+        uint64_t m64, w
+        size_t i = 0
+
+    for i in range(8):
+        m[i] = mask[(offset + i) & 3]
+    memcpy(&m64, m, 8)
+
+    # Unmask a word at a time; memcpy keeps the accesses alignment-safe
+    # and compiles down to plain loads and stores.
+    i = 0
+    while i + 8 <= length:
+        memcpy(&w, data + i, 8)
+        w ^= m64
+        memcpy(data + i, &w, 8)
+        i += 8
+    while i < length:
+        data[i] ^= m[i & 7]
+        i += 1
+
+
+cdef struct _Utf8State:
+    # Continuation bytes still expected, and the range allowed for the
+    # next one (narrower after some lead bytes, which rules out overlong
+    # forms, surrogates and code points above U+10FFFF).
+    uint8_t need
+    uint8_t lo
+    uint8_t hi
+
+
+cdef inline void _utf8_reset(_Utf8State* st) noexcept nogil:
+    st.need = 0
+    st.lo = 0x80
+    st.hi = 0xBF
+
+
+cdef bint _utf8_feed(_Utf8State* st, const uint8_t* data,
+                     size_t length) noexcept nogil:
+    # Validate UTF-8 incrementally; a sequence may be split anywhere.
+    # Returns False on an invalid sequence.
+    cdef:
+        size_t i = 0
+        uint64_t w
+        uint8_t c
+
+    while i < length:
+        if st.need == 0:
+            # Skip ASCII a word at a time.
+            while i + 8 <= length:
+                memcpy(&w, data + i, 8)
+                if w & 0x8080808080808080ULL:
+                    break
+                i += 8
+            if i == length:
+                break
+
+            c = data[i]
+            i += 1
+            if c < 0x80:
+                continue
+            elif 0xC2 <= c <= 0xDF:
+                st.need = 1
+            elif 0xE0 <= c <= 0xEF:
+                st.need = 2
+                if c == 0xE0:
+                    st.lo = 0xA0
+                elif c == 0xED:
+                    st.hi = 0x9F
+            elif 0xF0 <= c <= 0xF4:
+                st.need = 3
+                if c == 0xF0:
+                    st.lo = 0x90
+                elif c == 0xF4:
+                    st.hi = 0x8F
+            else:
+                return False
+        else:
+            c = data[i]
+            i += 1
+            if c < st.lo or c > st.hi:
+                return False
+            st.need -= 1
+            st.lo = 0x80
+            st.hi = 0xBF
+
+    return True
+
+
+cdef bint _is_valid_opcode(int opcode) noexcept:
+    return (WS_OP_CONTINUATION <= opcode <= WS_OP_BINARY or
+            WS_OP_CLOSE <= opcode <= WS_OP_PONG)
+
+
+cdef bint _is_valid_close_code(int code) noexcept:
+    # RFC 6455, section 7.4: 1004-1006 and 1015 must not be sent, the
+    # rest of 1000-2999 is reserved; 1012-1014 are registered with IANA.
+    return (1000 <= code <= 1003 or 1007 <= code <= 1014 or
+            3000 <= code <= 4999)
+
+
+cdef class WebSocketFrameParser:
+
+    cdef:
+        bint _server_side
+        uint64_t _max_message_size
+
+        _FrameState _state
+        uint8_t _header[MAX_HEADER_LENGTH]
+        size_t _header_len
+        size_t _header_need
+
+        bint _fin
+        bint _masked
+        int _opcode
+        uint8_t _mask[4]
+        size_t _mask_pos
+        uint64_t _remaining
+
+        bint _in_message
+        bint _text
+        _Utf8State _utf8
+        uint64_t _message_size
+
+        uint8_t _control[MAX_CONTROL_PAYLOAD]
+        size_t _control_len
+
+        _proto_on_message_begin, _proto_on_message_data, \
+        _proto_on_message_complete, _proto_on_control_frame
+
+    def __init__(self, protocol, *, server_side=True, max_message_size=None):
+        self._server_side = server_side
+        if max_message_size is None:
+            self._max_message_size = 0
+        elif max_message_size <= 0:
+            raise ValueError('max_message_size must be positive')
+        else:
+            self._max_message_size = max_message_size
+
+        self._state = WS_HEADER
+        self._header_len = 0
+        self._header_need = 2
+        self._in_message = False
+
+        self._proto_on_message_begin = getattr(
+            protocol, 'on_ws_message_begin', None)
+        self._proto_on_message_data = getattr(
+            protocol, 'on_ws_message_data', None)
+        self._proto_on_message_complete = getattr(
+            protocol, 'on_ws_message_complete', None)
+        self._proto_on_control_frame = getattr(
+            protocol, 'on_ws_control_frame', None)
+
+    cdef size_t _feed_header(self, const uint8_t* at, size_t length):
+        cdef:
+            size_t n = self._header_need - self._header_len
+            size_t len7
+
+        if n > length:
+            n = length
+        memcpy(self._header + self._header_len, at, n)
+        self._header_len += n
+
+        if self._header_len == 2 and self._header_need == 2:
+            len7 = self._header[1] & 0x7f
+            if len7 == 126:
+                self._header_need += 2
+            elif len7 == 127:
+                self._header_need += 8
+            if self._header[1] & 0x80:
+                self._header_need += 4
+
+        return n
+
+    cdef _on_header(self):
+        cdef:
+            uint8_t* h = self._header
+            uint64_t length = h[1] & 0x7f
+            size_t pos = 2
+            int i
+
+        if h[0] & 0x70:
+            raise HttpParserWebSocketError(
+                'reserved bits set without a negotiated extension')
+
+        self._fin = (h[0] & 0x80) != 0
+        self._opcode = h[0] & 0x0f
+        self._masked = (h[1] & 0x80) != 0
+
+        if length == 126:
+            length = (<uint64_t>h[2] << 8) | h[3]
+            pos = 4
+        elif length == 127:
+            length = 0
+            for i in range(8):
+                length = (length << 8) | h[2 + i]
+            if length >> 63:
+                raise HttpParserWebSocketError('invalid frame length')
+            pos = 10
+
+        if self._masked:
+            memcpy(self._mask, h + pos, 4)
+        self._mask_pos = 0
+        self._remaining = length
+
+        if self._masked != self._server_side:
+            raise HttpParserWebSocketError(
+                'frames from clients must be masked' if self._server_side
+                else 'frames from servers must not be masked')
+
+        if not _is_valid_opcode(self._opcode):
+            raise HttpParserWebSocketError(
+                'reserved opcode {:#x}'.format(self._opcode))
+
+        if self._opcode & 0x8:
+            if not self._fin:
+                raise HttpParserWebSocketError(
+                    'fragmented control frame')
+            if length > MAX_CONTROL_PAYLOAD:
+                raise HttpParserWebSocketError(
+                    'control frame payload too long')
+            if self._opcode == WS_OP_CLOSE and length == 1:
+                raise HttpParserWebSocketError(
+                    'close frame payload of 1 byte')
+            self._control_len = 0
+            return
+
+        if self._opcode == WS_OP_CONTINUATION:
+            if not self._in_message:
+                raise HttpParserWebSocketError(
+                    'continuation frame without a message')
+        else:
+            if self._in_message:
+                raise HttpParserWebSocketError(
+                    'new message before the previous one was finished')
+            self._in_message = True
+            self._text = self._opcode == WS_OP_TEXT
+            _utf8_reset(&self._utf8)
+            self._message_size = 0
+            if self._proto_on_message_begin is not None:
+                self._proto_on_message_begin(self._opcode)
+
+        self._message_size += length
+        if (self._max_message_size and
+                self._message_size > self._max_message_size):
+            raise HttpParserWebSocketError(
+                'message exceeds the maximum of {} bytes'.format(
+                    self._max_message_size))
+
+    cdef _on_payload(self, const uint8_t* at, size_t length):
+        cdef:
+            bytes data
+            uint8_t* buf
+
+        if self._opcode & 0x8:
+            buf = self._control + self._control_len
+            memcpy(buf, at, length)
+            self._control_len += length
+        else:
+            if self._proto_on_message_data is None and not self._text:
+                return
+            # Allocate uninitialized: for a single byte, passing the
+            # data would return a shared cached object.
+            data = PyBytes_FromStringAndSize(NULL, <Py_ssize_t>length)
+            buf = <uint8_t*>PyBytes_AS_STRING(data)
+            memcpy(buf, at, length)
+
+        if self._masked:
+            _xor_mask(buf, length, self._mask, self._mask_pos)
+            self._mask_pos = (self._mask_pos + length) & 3
+
+        if not self._opcode & 0x8:
+            # RFC 6455, section 8.1: invalid text fails the connection.
+            if self._text and not _utf8_feed(&self._utf8, buf, length):
+                raise HttpParserWebSocketError(
+                    'text message is not valid UTF-8')
+            if self._proto_on_message_data is not None:
+                self._proto_on_message_data(data)
+
+    cdef _check_close_payload(self):
+        cdef:
+            int code
+            _Utf8State utf8
+
+        if self._control_len < 2:
+            return
+        code = (self._control[0] << 8) | self._control[1]
+        if not _is_valid_close_code(code):
+            raise HttpParserWebSocketError(
+                'invalid close code {}'.format(code))
+        _utf8_reset(&utf8)
+        if (not _utf8_feed(&utf8, self._control + 2, self._control_len - 2)
+                or utf8.need):
+            raise HttpParserWebSocketError(
+                'close reason is not valid UTF-8')
+
+    cdef _on_frame_end(self):
+        if self._opcode & 0x8:
+            if self._opcode == WS_OP_CLOSE:
+                self._check_close_payload()
+            if self._proto_on_control_frame is not None:
+                self._proto_on_control_frame(
+                    self._opcode,
+                    PyBytes_FromStringAndSize(<const char*>self._control,
+                                              <Py_ssize_t>self._control_len))
+        elif self._fin:
+            if self._text and self._utf8.need:
+                raise HttpParserWebSocketError(
+                    'text message ends in an incomplete UTF-8 sequence')
+            self._in_message = False
+            if self._proto_on_message_complete is not None:
+                self._proto_on_message_complete()
+
+    cdef _feed(self, const uint8_t* at, size_t length):
+        cdef:
+            size_t i = 0
+            size_t n
+
+        while i < length:
+            if self._state == WS_HEADER:
+                i += self._feed_header(at + i, length - i)
+                if self._header_len < self._header_need:
+                    continue
+
+                self._header_len = 0
+                self._header_need = 2
+                self._on_header()
+                if self._remaining:
+                    self._state = WS_PAYLOAD
+                else:
+                    self._on_frame_end()
+
+            else:
+                n = length - i
+                if n > self._remaining:
+                    n = <size_t>self._remaining
+                self._on_payload(at + i, n)
+                i += n
+                self._remaining -= n
+
+                if not self._remaining:
+                    self._state = WS_HEADER
+                    self._on_frame_end()
+
+    ### Public API ###
+
+    def feed_data(self, data):
+        cdef Py_buffer buf
+
+        PyObject_GetBuffer(data, &buf, PyBUF_SIMPLE)
+        try:
+            self._feed(<const uint8_t*>buf.buf, <size_t>buf.len)
+        finally:
+            PyBuffer_Release(&buf)
+
+
+def build_frame(int opcode, payload=b'', *, bint fin=True, mask=None):
+    cdef:
+        Py_buffer buf
+        size_t length
+        size_t header_len = 2
+        bytes frame
+        uint8_t* out
+        const uint8_t* mask_p = NULL
+        int i
+
+    if not _is_valid_opcode(opcode):
+        raise ValueError('invalid opcode {:#x}'.format(opcode))
+
+    if mask is not None:
+        if not isinstance(mask, bytes) or len(mask) != 4:
+            raise ValueError('mask must be 4 bytes')
+        mask_p = <const uint8_t*>PyBytes_AS_STRING(mask)
+        header_len += 4
+
+    PyObject_GetBuffer(payload, &buf, PyBUF_SIMPLE)
+    try:
+        length = <size_t>buf.len
+
+        if opcode & 0x8 and (not fin or length > MAX_CONTROL_PAYLOAD):
+            raise ValueError(
+                'control frames must not be fragmented and their payload '
+                'must not exceed {} bytes'.format(MAX_CONTROL_PAYLOAD))
+
+        if length >= 1 << 16:
+            header_len += 8
+        elif length >= 126:
+            header_len += 2
+
+        frame = PyBytes_FromStringAndSize(
+            NULL, <Py_ssize_t>(header_len + length))
+        out = <uint8_t*>PyBytes_AS_STRING(frame)
+
+        out[0] = (0x80 if fin else 0) | opcode
+        out[1] = 0x80 if mask_p is not NULL else 0
+        if length >= 1 << 16:
+            out[1] |= 127
+            for i in range(8):
+                out[2 + i] = <uint8_t>(length >> (8 * (7 - i)))
+        elif length >= 126:
+            out[1] |= 126
+            out[2] = <uint8_t>(length >> 8)
+            out[3] = <uint8_t>length
+        else:
+            out[1] |= <uint8_t>length
+
+        memcpy(out + header_len, buf.buf, length)
+        if mask_p is not NULL:
+            memcpy(out + header_len - 4, mask_p, 4)
+            _xor_mask(out + header_len, length, mask_p, 0)
+    finally:
+        PyBuffer_Release(&buf)
+
+    return frame
@@ -0,0 +1,256 @@
+"""Parallel replay of captured HTTP/1.x streams.
+
+Every capture file holds the raw bytes of one direction of one
+connection.  Files are memory-mapped and parsed with
+``feed_file(spans=True)``, so only offsets and lengths reach Python,
+and independent streams are parsed in a process pool.  The results
+are collected into flat ``array`` columns instead of one Python object
+per message.
+"""
+
+from __future__ import annotations
+
+import array
+import concurrent.futures
+import os
+from typing import Iterable, List, Optional, Tuple, Union
+
+from .parser import (
+    HttpParserError,
+    HttpParserUpgrade,
+    HttpRequestParser,
+    HttpResponseParser,
+)
+
+
+__all__ = ('ReplayResult', 'replay')
+
+
+StrPath = Union[str, 'os.PathLike[str]']
+
+
+class ReplayResult:
+    """Columnar result of :func:`replay`.
+
+    Per-message columns, all of the same length:
+
+      - ``stream``: index into ``paths`` of the stream of the message
+      - ``code``: the status code for responses, or an index into
+        ``methods`` for requests
+      - ``header_count``: number of headers
+      - ``body_size``: number of body bytes
+      - ``keep_alive``: 1 if the connection is kept open afterwards
+      - ``start``, ``end``: offsets of the message in its stream
+
+    Per-stream columns, indexed like ``paths``:
+
+      - ``stream_size``: size of the capture in bytes
+      - ``upgrade_offset``: offset of the non-HTTP data after an
+        upgrade, or -1
+      - ``error_offset``: offset at which parsing stopped on an
+        error, or -1; a stream that ends in the middle of a message
+        has its size as error offset
+
+    ``errors`` maps a stream index to the parser error message that
+    stopped it.
+    """
+
+    def __init__(self, paths: List[str], response: bool) -> None:
+        self.paths = paths
+        self.response = response
+        self.methods: List[bytes] = []
+
+        self.stream = array.array('I')
+        self.code = array.array('H')
+        self.header_count = array.array('I')
+        self.body_size = array.array('Q')
+        self.keep_alive = array.array('B')
+        self.start = array.array('Q')
+        self.end = array.array('Q')
+
+        self.stream_size = array.array('Q')
+        self.upgrade_offset = array.array('q')
+        self.error_offset = array.array('q')
+        self.errors: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.stream)
+
+    def __repr__(self) -> str:
+        return '<ReplayResult streams: {}, messages: {}, errors: {}>'.format(
+            len(self.paths), len(self.stream), len(self.errors))
+
+
+class _StreamRecorder:
+
+    def __init__(self, response: bool) -> None:
+        if response:
+            self.parser: Union[HttpRequestParser, HttpResponseParser] = \
+                HttpResponseParser(self)
+        else:
+            self.parser = HttpRequestParser(self)
+        self.response = response
+
+        self.methods: List[bytes] = []
+        self.code = array.array('H')
+        self.header_count = array.array('I')
+        self.body_size = array.array('Q')
+        self.keep_alive = array.array('B')
+        self.start = array.array('Q')
+        self.end = array.array('Q')
+
+        self._headers = 0
+        self._body = 0
+
+    def on_message_begin(self) -> None:
+        self._headers = 0
+        self._body = 0
+
+    def on_header_span(self, name_offset: int, name_length: int,
+                       value_offset: int, value_length: int) -> None:
+        self._headers += 1
+
+    def on_body_span(self, offset: int, length: int) -> None:
+        self._body += length
+
+    def on_message_complete(self) -> None:
+        parser = self.parser
+        if isinstance(parser, HttpResponseParser):
+            self.code.append(parser.get_status_code())
+        else:
+            self.code.append(0)
+            self.methods.append(parser.get_method())
+        self.header_count.append(self._headers)
+        self.body_size.append(self._body)
+        self.keep_alive.append(parser.should_keep_alive())
+
+    def on_message_span(self, offset: int, length: int) -> None:
+        self.start.append(offset)
+        self.end.append(offset + length)
+
+
+_StreamColumns = Tuple[
+    int,                # stream size
+    int,                # upgrade offset
+    int,                # error offset
+    Optional[str],      # error
+    List[bytes],        # request methods
+    'array.array[int]',  # code
+    'array.array[int]',  # header_count
+    'array.array[int]',  # body_size
+    'array.array[int]',  # keep_alive
+    'array.array[int]',  # start
+    'array.array[int]',  # end
+]
+
+
+def _format_error(ex: Exception) -> str:
+    return '{}: {}'.format(type(ex).__name__, ex)
+
+
+def _parse_stream(path: str, response: bool) -> _StreamColumns:
+    rec = _StreamRecorder(response)
+    parser = rec.parser
+    upgrade_offset = -1
+    error_offset = -1
+    error = None
+
+    size = os.stat(path).st_size
+    try:
+        parser.feed_file(path, spans=True)
+    except HttpParserUpgrade as ex:
+        upgrade_offset = ex.args[0]
+    except HttpParserError as ex:
+        error = _format_error(ex)
+        error_offset = parser.get_error_pos()
+    else:
+        # Completes a message delimited by the end of the stream, and
+        # reports a message cut short by it.
+        try:
+            parser.feed_eof()
+        except HttpParserError as ex:
+            error = 'incomplete message: {}'.format(_format_error(ex))
+            error_offset = size
+
+    return (size, upgrade_offset, error_offset, error, rec.methods,
+            rec.code, rec.header_count, rec.body_size, rec.keep_alive,
+            rec.start, rec.end)
+
+
+def _list_paths(source: Union[StrPath, Iterable[StrPath]]) -> List[str]:
+    if isinstance(source, (str, os.PathLike)):
+        root = os.fspath(source)
+        if not os.path.isdir(root):
+            return [root]
+        return sorted(
+            entry.path for entry in os.scandir(root)
+            if entry.is_file())
+    return [os.fspath(p) for p in source]
+
+
+def replay(
+    source: Union[StrPath, Iterable[StrPath]],
+    *,
+    response: bool = False,
+    processes: Optional[int] = None,
+) -> ReplayResult:
+    """Parse captured HTTP/1.x streams in parallel.
+
+    ``source`` is a directory, in which case every regular file in it
+    is a stream, a single capture file, or an iterable of files.
+    Streams are parsed with ``HttpResponseParser`` if ``response`` is
+    true, and with ``HttpRequestParser`` otherwise.
+
+    ``processes`` is the size of the process pool; it defaults to the
+    number of CPUs.  With ``processes=0`` everything is parsed in the
+    calling process.
+    """
+    paths = _list_paths(source)
+    result = ReplayResult(paths, response)
+    method_ids: dict[bytes, int] = {}
+
+    if processes == 0:
+        parsed = map(_parse_stream, paths, [response] * len(paths))
+        _collect(result, method_ids, parsed)
+    else:
+        workers = processes or os.cpu_count() or 1
+        chunksize = max(1, len(paths) // (4 * workers))
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            parsed = pool.map(_parse_stream, paths, [response] * len(paths),
+                              chunksize=chunksize)
+            _collect(result, method_ids, parsed)
+
+    return result
+
+
+def _collect(
+    result: ReplayResult,
+    method_ids: dict[bytes, int],
+    parsed: Iterable[_StreamColumns],
+) -> None:
+    for idx, columns in enumerate(parsed):
+        (size, upgrade_offset, error_offset, error, methods, code,
+         header_count, body_size, keep_alive, start, end) = columns
+
+        result.stream_size.append(size)
+        result.upgrade_offset.append(upgrade_offset)
+        result.error_offset.append(error_offset)
+        if error is not None:
+            result.errors[idx] = error
+
+        if methods:
+            code = array.array('H')
+            for method in methods:
+                mid = method_ids.get(method)
+                if mid is None:
+                    mid = method_ids[method] = len(result.methods)
+                    result.methods.append(method)
+                code.append(mid)
+
+        result.stream.extend(array.array('I', [idx]) * len(code))
+        result.code.extend(code)
+        result.header_count.extend(header_count)
+        result.body_size.extend(body_size)
+        result.keep_alive.extend(keep_alive)
+        result.start.extend(start)
+        result.end.extend(end)
@@ -1,7 +1,11 @@
 import sys
 
+import glob
 import os.path
 import pathlib
+import shutil
+import subprocess
+import tempfile
 
 from setuptools import setup, Extension
 from setuptools.command.build_ext import build_ext as build_ext
@@ -9,6 +13,16 @@ from setuptools.command.build_ext import build_ext as build_ext
 
 CFLAGS = ['-O2', '-DCYTHON_FREETHREADING_COMPATIBLE=1']
 
+# The extensions keep no process-wide C state: with module state and
+# heap types, the Cython globals, types and freelists live in the
+# per-interpreter module objects, so they can be loaded into isolated
+# subinterpreters (PEP 684), which exist since Python 3.12.
+CYTHON_DIRECTIVES = {
+    'subinterpreters_compatible': 'own_gil',
+}
+if sys.version_info >= (3, 12):
+    CFLAGS += ['-DCYTHON_USE_MODULE_STATE=1', '-DCYTHON_USE_TYPE_SPECS=1']
+
 ROOT = pathlib.Path(__file__).parent
 
 CYTHON_DEPENDENCY = 'Cython>=3.1.0'
@@ -26,6 +40,12 @@ class httptools_build_ext(build_ext):
             'Use the system provided llhttp, instead of the bundled one'),
         ('use-system-http-parser', None,
             'Use the system provided http-parser, instead of the bundled one'),
+        ('lto', None,
+            'Build with link-time optimization'),
+        ('pgo', None,
+            'Build twice, optimizing with a profile of a training workload'),
+        ('pgo-workload=', None,
+            'Python script to use as the PGO training workload'),
     ]
 
     boolean_options = build_ext.boolean_options + [
@@ -33,6 +53,8 @@ class httptools_build_ext(build_ext):
         'cython-annotate',
         'use-system-llhttp',
         'use-system-http-parser',
+        'lto',
+        'pgo',
     ]
 
     def initialize_options(self):
@@ -45,6 +67,9 @@ class httptools_build_ext(build_ext):
         super().initialize_options()
         self.use_system_llhttp = False
         self.use_system_http_parser = False
+        self.lto = False
+        self.pgo = False
+        self.pgo_workload = None
         self.cython_always = False
         self.cython_annotate = None
         self.cython_directives = None
@@ -86,7 +111,7 @@ class httptools_build_ext(build_ext):
 
             from Cython.Build import cythonize
 
-            directives = {}
+            directives = dict(CYTHON_DIRECTIVES)
             if self.cython_directives:
                 for directive in self.cython_directives.split(','):
                     k, _, v = directive.partition('=')
@@ -107,7 +132,7 @@ class httptools_build_ext(build_ext):
         self._initialized = True
 
     def build_extensions(self):
-        mod_parser, mod_url_parser = self.distribution.ext_modules
+        mod_parser, mod_url_parser = self.distribution.ext_modules[:2]
         if self.use_system_llhttp:
             mod_parser.libraries.append('llhttp')
 
@@ -137,8 +162,104 @@ class httptools_build_ext(build_ext):
             mod_url_parser.sources.append(
                 'vendor/http-parser/http_parser.c')
 
+        if self.lto:
+            # The bundled llhttp and http-parser sources are compiled
+            # into the same extensions as the Cython modules, so LTO
+            # optimizes across them.
+            if self.compiler.compiler_type == 'msvc':
+                self._add_flags(['/GL'], ['/LTCG'])
+            else:
+                self._add_flags(['-flto'], ['-flto'])
+
+        if self.pgo:
+            self._build_pgo()
+        else:
+            super().build_extensions()
+
+    def _add_flags(self, compile_args, link_args):
+        for ext in self.distribution.ext_modules:
+            # Extensions share the CFLAGS list, so never mutate it.
+            ext.extra_compile_args = ext.extra_compile_args + compile_args
+            ext.extra_link_args = ext.extra_link_args + link_args
+
+    def _is_clang(self):
+        try:
+            out = subprocess.run(
+                self.compiler.compiler[:1] + ['--version'],
+                capture_output=True, text=True, check=True).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return False
+        return 'clang' in out
+
+    def _build_pgo(self):
+        if self.compiler.compiler_type == 'msvc':
+            raise RuntimeError('--pgo is only supported with GCC and Clang')
+
+        profile_dir = os.path.abspath(os.path.join(self.build_temp, 'pgo'))
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        os.makedirs(profile_dir)
+
+        saved = [(ext.extra_compile_args, ext.extra_link_args)
+                 for ext in self.distribution.ext_modules]
+
+        # Stage 1: build instrumented extensions and run the workload.
+        # Up-to-date extensions would not be rebuilt with instrumentation.
+        flags = ['-fprofile-generate={}'.format(profile_dir)]
+        self._add_flags(flags, flags)
+        self.force = True
+        super().build_extensions()
+        self._run_pgo_workload()
+
+        # GCC may write the .gcda files into subdirectories.
+        profiles = glob.glob(
+            os.path.join(profile_dir, '**', '*.profraw' if self._is_clang()
+                         else '*.gcda'),
+            recursive=True)
+        if not profiles:
+            raise RuntimeError(
+                'the PGO workload did not produce any profile data '
+                'in {}'.format(profile_dir))
+
+        if self._is_clang():
+            profdata = os.environ.get('LLVM_PROFDATA', 'llvm-profdata')
+            subprocess.run(
+                [profdata, 'merge',
+                 '-output={}'.format(
+                     os.path.join(profile_dir, 'default.profdata'))] +
+                profiles,
+                check=True)
+            use_flags = ['-Wno-profile-instr-unprofiled']
+        else:
+            use_flags = ['-fprofile-correction', '-Wno-missing-profile']
+
+        # Stage 2: rebuild everything using the recorded profile.
+        for ext, (compile_args, link_args) in zip(
+                self.distribution.ext_modules, saved):
+            ext.extra_compile_args = compile_args
+            ext.extra_link_args = link_args
+        flags = ['-fprofile-use={}'.format(profile_dir)]
+        self._add_flags(flags + use_flags, flags)
         super().build_extensions()
 
+    def _run_pgo_workload(self):
+        workload = self.pgo_workload or str(
+            ROOT / 'tools' / 'pgo_workload.py')
+
+        # Assemble an importable copy of the package with the freshly
+        # built extensions, wherever build_ext put them.
+        with tempfile.TemporaryDirectory() as tmp:
+            shutil.copytree(
+                str(ROOT / 'httptools'), os.path.join(tmp, 'httptools'),
+                ignore=shutil.ignore_patterns(
+                    '*.c', '*.so', '*.pyd', '__pycache__'))
+            for ext in self.distribution.ext_modules:
+                shutil.copy(
+                    self.get_ext_fullpath(ext.name),
+                    os.path.join(tmp, *ext.name.split('.')[:-1]))
+
+            env = dict(os.environ, PYTHONPATH=tmp)
+            subprocess.run([sys.executable, workload], env=env, check=True)
+
 
 with open(str(ROOT / 'httptools' / '_version.py')) as f:
     for line in f:
@@ -174,6 +295,34 @@ setup(
             ],
             extra_compile_args=CFLAGS,
         ),
+        Extension(
+            "httptools.parser.header_parser",
+            sources=[
+                "httptools/parser/header_parser.pyx",
+            ],
+            extra_compile_args=CFLAGS,
+        ),
+        Extension(
+            "httptools.parser.router",
+            sources=[
+                "httptools/parser/router.pyx",
+            ],
+            extra_compile_args=CFLAGS,
+        ),
+        Extension(
+            "httptools.parser.multipart",
+            sources=[
+                "httptools/parser/multipart.pyx",
+            ],
+            extra_compile_args=CFLAGS,
+        ),
+        Extension(
+            "httptools.parser.websocket",
+            sources=[
+                "httptools/parser/websocket.pyx",
+            ],
+            extra_compile_args=CFLAGS,
+        ),
     ],
     include_package_data=True,
     exclude_package_data={"": ["*.c", "*.h"]},
@@ -0,0 +1,129 @@
+import os
+import sys
+import threading
+import unittest
+
+import httptools
+
+interpreters = None
+if sys.version_info >= (3, 13):
+    try:
+        from test.support import interpreters
+    except ImportError:
+        pass
+
+
+THREADS = 8
+ITERATIONS = 2000
+
+
+WORKER = '''
+import httptools
+
+
+class Recorder:
+
+    def on_url(self, url):
+        self.url += url
+
+    def on_header(self, name, value):
+        self.headers.append((name, value))
+
+    def on_body(self, body):
+        self.body += body
+
+    def on_message_complete(self):
+        self.complete += 1
+
+
+def work(n, iterations):
+    for i in range(iterations):
+        rec = Recorder()
+        rec.url = b''
+        rec.headers = []
+        rec.body = b''
+        rec.complete = 0
+
+        url = '/w{}/{}?q={}#f'.format(n, i, i).encode()
+        body = str(i).encode() * 3
+        data = (
+            b'POST ' + url + b' HTTP/1.1\\r\\n'
+            b'Host: example.com\\r\\n'
+            b'Content-Length: ' + str(len(body)).encode() + b'\\r\\n'
+            b'\\r\\n' + body
+        )
+
+        p = httptools.HttpRequestParser(rec)
+        split = i % len(data)
+        p.feed_data(data[:split])
+        p.feed_data(data[split:])
+
+        assert rec.complete == 1, rec.complete
+        assert rec.url == url, (rec.url, url)
+        assert rec.body == body, (rec.body, body)
+        assert rec.headers[0] == (b'Host', b'example.com'), rec.headers
+
+        parsed = httptools.parse_url(rec.url)
+        assert parsed.path == '/w{}/{}'.format(n, i).encode(), parsed
+        assert parsed.query == 'q={}'.format(i).encode(), parsed
+        assert parsed.fragment == b'f', parsed
+'''
+
+
+class TestConcurrency(unittest.TestCase):
+
+    def test_parse_in_threads(self):
+        namespace = {}
+        exec(WORKER, namespace)
+        work = namespace['work']
+
+        barrier = threading.Barrier(THREADS)
+        errors = []
+
+        def worker(n):
+            try:
+                barrier.wait()
+                work(n, ITERATIONS)
+            except BaseException as ex:
+                errors.append(ex)
+
+        # With the GIL, switch threads often to interleave the parsers
+        # as much as possible.
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=worker, args=(n,))
+                       for n in range(THREADS)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertEqual(errors, [])
+
+    @unittest.skipIf(interpreters is None, 'subinterpreters not available')
+    def test_parse_in_subinterpreters(self):
+        root = os.path.dirname(os.path.dirname(httptools.__file__))
+        setup = 'import sys\nsys.path.insert(0, {!r})\n'.format(root)
+        errors = []
+
+        def worker(n):
+            interp = interpreters.create()
+            try:
+                interp.exec(setup + WORKER + '\nwork({}, {})\n'.format(
+                    n, ITERATIONS // 4))
+            except BaseException as ex:
+                errors.append(ex)
+            finally:
+                interp.close()
+
+        threads = [threading.Thread(target=worker, args=(n,))
+                   for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import httptools
+
+
+# Cumulative "import httptools" time, in microseconds, as reported by
+# python -X importtime.  The best of a few runs is compared, to make
+# the check robust against noise on busy machines.
+IMPORT_TIME_BUDGET = 20000
+IMPORT_TIME_RUNS = 5
+
+LAZY_MODULES = (
+    'httptools.parser.protocol',
+    'httptools.parser.url_parser',
+    'httptools.parser.router',
+    'httptools.parser.websocket',
+)
+
+
+class TestImport(unittest.TestCase):
+
+    def run_python(self, *args):
+        root = os.path.dirname(os.path.dirname(httptools.__file__))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            filter(None, [root, env.get('PYTHONPATH')]))
+        return subprocess.run(
+            [sys.executable] + list(args),
+            env=env, capture_output=True, text=True, check=True)
+
+    def test_import_is_lazy(self):
+        out = self.run_python(
+            '-c', 'import sys, httptools; print(*sorted(sys.modules))')
+        modules = set(out.stdout.split())
+
+        self.assertIn('httptools.parser.parser', modules)
+        for name in LAZY_MODULES:
+            self.assertNotIn(name, modules)
+
+    def test_lazy_attributes(self):
+        out = self.run_python('-c', '\n'.join([
+            'import httptools',
+            'assert "parse_url" in dir(httptools)',
+            'assert httptools.parse_url(b"/a?b").query == b"b"',
+            'assert httptools.HTTPProtocol is '
+            'httptools.parser.HTTPProtocol',
+            'from httptools import *',
+            'print(Router, WebSocketFrameParser)',
+        ]))
+        self.assertIn('Router', out.stdout)
+
+        with self.assertRaises(AttributeError):
+            httptools.no_such_name
+        with self.assertRaises(AttributeError):
+            httptools.parser.no_such_name
+
+    def test_import_time_budget(self):
+        best = None
+        for _ in range(IMPORT_TIME_RUNS):
+            out = self.run_python('-X', 'importtime', '-c', 'import httptools')
+            for line in out.stderr.splitlines():
+                # import time: self [us] | cumulative | imported package
+                fields = line.split('|')
+                if len(fields) == 3 and fields[2].strip() == 'httptools':
+                    cumulative = int(fields[1])
+                    if best is None or cumulative < best:
+                        best = cumulative
+
+        self.assertIsNotNone(best)
+        self.assertLess(
+            best, IMPORT_TIME_BUDGET,
+            'importing httptools took {} us'.format(best))
@@ -1,6 +1,11 @@
 import httptools
+from httptools.parser import websocket
 
+import gzip
+import os
+import tempfile
 import unittest
+import zlib
 from unittest import mock
 
 
@@ -82,6 +87,30 @@ data'''.replace(b'\n', b'\r\n')
 
 class TestResponseParser(unittest.TestCase):
 
+    def test_parser_response_feed_eof(self):
+        class Error(Exception):
+            pass
+
+        m = mock.Mock()
+        p = httptools.HttpResponseParser(m)
+        p.feed_data(b'HTTP/1.1 200 OK\r\nConnection: close\r\n\r\nhello')
+        p.feed_data(b' world')
+        self.assertFalse(m.on_message_complete.called)
+
+        p.feed_eof()
+        m.on_message_complete.assert_called_once_with()
+        self.assertEqual(
+            b''.join(c.args[0] for c in m.on_body.call_args_list),
+            b'hello world')
+
+        m = mock.Mock()
+        m.on_message_complete.side_effect = Error()
+        p = httptools.HttpResponseParser(m)
+        p.feed_data(b'HTTP/1.1 200 OK\r\n\r\nhello')
+        with self.assertRaises(httptools.HttpParserCallbackError) as cm:
+            p.feed_eof()
+        self.assertIsInstance(cm.exception.__context__, Error)
+
     def test_parser_response_1(self):
         m = mock.Mock()
 
@@ -113,6 +142,23 @@ class TestResponseParser(unittest.TestCase):
         self.assertFalse(m.on_chunk_header.called)
         self.assertFalse(m.on_chunk_complete.called)
 
+    def test_parser_response_status_line(self):
+        p = httptools.HttpResponseParser(None)
+        p.feed_data(RESPONSE1_HEAD[:12])
+        p.feed_data(RESPONSE1_HEAD[12:])
+
+        self.assertEqual(p.get_status_line(), ((1, 1), 200, b'OK'))
+        self.assertIs(p.get_status_line()[2], p.get_status_line()[2])
+
+        p = httptools.HttpResponseParser(None)
+        p.feed_data(b'HTTP/1.1 200 Fine\r\nContent-Length: 0\r\n\r\n')
+        self.assertEqual(p.get_status_line(), ((1, 1), 200, b'Fine'))
+
+        p.feed_data(b'HTTP/1.1 599 Custom reason\r\n'
+                    b'Content-Length: 0\r\n\r\n')
+        self.assertEqual(p.get_status_line(),
+                         ((1, 1), 599, b'Custom reason'))
+
     def test_parser_response_1b(self):
         p = httptools.HttpResponseParser(None)
 
@@ -252,6 +298,102 @@ class TestResponseParser(unittest.TestCase):
         else:
             self.fail('HttpParserCallbackError was not raised')
 
+    def test_parser_response_content_decoding(self):
+        body = b'hello world ' * 10000
+        gzipped = gzip.compress(body)
+
+        for encoding, data in [(b'gzip', gzipped),
+                               (b'deflate', zlib.compress(body)),
+                               (b'Deflate', zlib.compress(body, wbits=-15))]:
+            m = mock.Mock()
+            p = httptools.HttpResponseParser(m)
+            p.enable_content_decoding(block_size=50000)
+
+            resp = (b'HTTP/1.1 200 OK\r\nContent-Encoding: ' + encoding +
+                    b'\r\nContent-Length: ' + str(len(data)).encode() +
+                    b'\r\n\r\n' + data)
+            for i in range(0, len(resp), 100):
+                p.feed_data(resp[i:i + 100])
+
+            blocks = [c.args[0] for c in m.on_body.call_args_list]
+            self.assertEqual(b''.join(blocks), body)
+            self.assertTrue(all(len(b) >= 50000 for b in blocks[:-1]))
+            m.on_message_complete.assert_called_once_with()
+
+        # Identity bodies are passed through untouched.
+        m = mock.Mock()
+        p = httptools.HttpResponseParser(m)
+        p.enable_content_decoding()
+        p.feed_data(RESPONSE1_HEAD + RESPONSE1_BODY)
+        m.on_body.assert_called_once_with(RESPONSE1_BODY)
+
+    def test_parser_response_content_decoding_max_size(self):
+        data = gzip.compress(b'\0' * 1000000)
+
+        m = mock.Mock()
+        p = httptools.HttpResponseParser(m)
+        p.enable_content_decoding(max_size=100000)
+
+        with self.assertRaises(httptools.HttpParserDecodingError):
+            p.feed_data(b'HTTP/1.1 200 OK\r\nContent-Encoding: gzip\r\n'
+                        b'Content-Length: ' + str(len(data)).encode() +
+                        b'\r\n\r\n' + data)
+        self.assertFalse(m.on_body.called)
+
+    def test_parser_response_content_decoding_errors(self):
+        body = b'hello world ' * 100
+
+        for encoding, data in [(b'gzip', gzip.compress(body)[:-8]),
+                               (b'deflate', zlib.compress(body)[:-10]),
+                               (b'gzip', b'garbage!!'),
+                               (b'deflate', b'\x78garbage!!'),
+                               (b'gzip', gzip.compress(body) + b'garbage'),
+                               (b'deflate', zlib.compress(body) + b'x')]:
+            m = mock.Mock()
+            p = httptools.HttpResponseParser(m)
+            p.enable_content_decoding()
+
+            with self.assertRaises(httptools.HttpParserDecodingError):
+                p.feed_data(b'HTTP/1.1 200 OK\r\nContent-Encoding: ' +
+                            encoding + b'\r\nContent-Length: ' +
+                            str(len(data)).encode() + b'\r\n\r\n' + data)
+            self.assertFalse(m.on_message_complete.called)
+
+        # An empty body is fine, e.g. in a response to HEAD.
+        m = mock.Mock()
+        p = httptools.HttpResponseParser(m)
+        p.enable_content_decoding()
+        p.feed_data(b'HTTP/1.1 200 OK\r\nContent-Encoding: gzip\r\n'
+                    b'Content-Length: 0\r\n\r\n')
+        m.on_message_complete.assert_called_once_with()
+        self.assertFalse(m.on_body.called)
+
+    def test_parser_response_content_decoding_members(self):
+        # Concatenated gzip members are one body (RFC 1952).
+        data = gzip.compress(b'abc') + gzip.compress(b'def')
+        resp = (b'HTTP/1.1 200 OK\r\nContent-Encoding: gzip\r\n'
+                b'Content-Length: ' + str(len(data)).encode() +
+                b'\r\n\r\n' + data)
+
+        for step in (1, 7, len(resp)):
+            m = mock.Mock()
+            p = httptools.HttpResponseParser(m)
+            p.enable_content_decoding()
+            for i in range(0, len(resp), step):
+                p.feed_data(resp[i:i + step])
+
+            m.on_body.assert_called_once_with(b'abcdef')
+            m.on_message_complete.assert_called_once_with()
+
+    def test_parser_response_content_decoding_no_on_body(self):
+        class Protocol:
+            def on_message_complete(self):
+                pass
+
+        p = httptools.HttpResponseParser(Protocol())
+        with self.assertRaises(TypeError):
+            p.enable_content_decoding(max_size=100)
+
     def test_parser_upgrade_response_1(self):
         m = mock.Mock()
 
@@ -495,11 +637,101 @@ class TestRequestParser(unittest.TestCase):
         else:
             self.fail('HttpParserCallbackError was not raised')
 
+    def test_parser_request_cache_key(self):
+        def cache_key(data, chunk=None, headers=(b'accept-encoding',)):
+            keys = []
+            m = mock.Mock()
+            p = httptools.HttpRequestParser(m)
+            p.enable_cache_key(headers, key=b'0123456789abcdef')
+            m.on_headers_complete.side_effect = \
+                lambda: keys.append(p.get_cache_key())
+
+            self.assertIsNone(p.get_cache_key())
+            if chunk is None:
+                p.feed_data(data)
+            else:
+                for i in range(0, len(data), chunk):
+                    p.feed_data(data[i:i + chunk])
+            self.assertEqual(keys, [p.get_cache_key()])
+            return keys[0]
+
+        req = (b'GET /a?b=c HTTP/1.1\r\nHost: x\r\n'
+               b'Accept-Encoding: gzip\r\n\r\n')
+        key = cache_key(req)
+        self.assertIsInstance(key, int)
+
+        self.assertEqual(cache_key(req, chunk=1), key)
+        self.assertEqual(cache_key(req.replace(b'Accept-Encoding',
+                                               b'ACCEPT-encoding')), key)
+        self.assertEqual(cache_key(req.replace(b'Host: x', b'Host: y')), key)
+
+        self.assertNotEqual(cache_key(req.replace(b'gzip', b'br')), key)
+        self.assertNotEqual(cache_key(req.replace(b'GET', b'HEAD')), key)
+        self.assertNotEqual(cache_key(req.replace(b'/a?', b'/b?')), key)
+        self.assertNotEqual(cache_key(req, headers=()), key)
+
+        # The URL is normalized.
+        for url in (b'http://example.com/a?b=c', b'HTTPS://x:80/a?b=c#f',
+                    b'/a?b=c#frag', b'/%61?%62=c', b'/a?b=c#'):
+            for chunk in (None, 1):
+                self.assertEqual(
+                    cache_key(req.replace(b'/a?b=c', url), chunk), key,
+                    url)
+
+        def url_key(url):
+            return cache_key(b'OPTIONS ' + url + b' HTTP/1.1\r\n\r\n')
+
+        self.assertEqual(url_key(b'/%2f%7E'), url_key(b'/%2F~'))
+        self.assertEqual(url_key(b'http://x'), url_key(b'/'))
+        self.assertEqual(url_key(b'http://x?a'), url_key(b'/?a'))
+        self.assertNotEqual(url_key(b'/%2F'), url_key(b'//'))
+        self.assertNotEqual(url_key(b'*'), url_key(b'/'))
+        self.assertNotEqual(url_key(b'/a%'), url_key(b'/a'))
+        self.assertNotEqual(url_key(b'/%4g'), url_key(b'/%4G'))
+
+        # A missing header is not the same as an empty one.
+        self.assertNotEqual(
+            cache_key(b'GET / HTTP/1.1\r\nAccept-Encoding:\r\n\r\n'),
+            cache_key(b'GET / HTTP/1.1\r\n\r\n'))
+
+        # Repeated headers hash like their combined value.
+        self.assertEqual(
+            cache_key(b'GET / HTTP/1.1\r\nAccept-Encoding: a\r\n'
+                      b'Accept-Encoding: b\r\n\r\n'),
+            cache_key(b'GET / HTTP/1.1\r\nAccept-Encoding: a, b\r\n\r\n'))
+
+    def test_parser_request_cache_key_errors(self):
+        p = httptools.HttpRequestParser(None)
+        with self.assertRaises(ValueError):
+            p.enable_cache_key(key=b'short')
+        with self.assertRaises(TypeError):
+            p.enable_cache_key(['accept'])
+
     def test_parser_request_2(self):
         p = httptools.HttpRequestParser(None)
         with self.assertRaises(httptools.HttpParserInvalidMethodError):
             p.feed_data(b'SPAM /test.php?a=b+c HTTP/1.1')
 
+    def test_parser_request_error_pos(self):
+        p = httptools.HttpRequestParser(None)
+        self.assertEqual(p.get_error_pos(), -1)
+        with self.assertRaises(httptools.HttpParserInvalidMethodError):
+            p.feed_data(b'GET / HTTP/1.1\r\n\r\nSPAM / HTTP/1.1')
+        self.assertEqual(p.get_error_pos(), 19)
+
+    def test_parser_request_feed_eof(self):
+        m = mock.Mock()
+        p = httptools.HttpRequestParser(m)
+        p.feed_eof()
+
+        p.feed_data(b'POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\nabc')
+        with self.assertRaisesRegex(httptools.HttpParserError, 'EOF'):
+            p.feed_eof()
+        self.assertFalse(m.on_message_complete.called)
+        self.assertIsInstance(p.get_error(), httptools.HttpParserError)
+        with self.assertRaises(httptools.HttpParserError):
+            p.feed_data(b'defghij')
+
     def test_parser_request_3(self):
         p = httptools.HttpRequestParser(None)
         with self.assertRaises(httptools.HttpParserInvalidURLError):
@@ -510,6 +742,43 @@ class TestRequestParser(unittest.TestCase):
         with self.assertRaisesRegex(TypeError, 'a bytes-like object'):
             p.feed_data('POST HTTP/1.1')
 
+    def test_parser_request_feed_data_status(self):
+        p = httptools.HttpRequestParser(None)
+        self.assertIsNone(p.get_error())
+
+        self.assertEqual(
+            p.feed_data_status(b'GET / HTTP/1.1\r\n'),
+            (httptools.FEED_OK, 0, -1, 16))
+
+        data = b'Host: a\r\nBad Header: 1\r\n\r\n'
+        status, errno, pos, consumed = p.feed_data_status(data)
+        self.assertEqual(status, httptools.FEED_ERROR)
+        self.assertNotEqual(errno, 0)
+        self.assertEqual(pos, consumed)
+        self.assertEqual(data[pos:], b' Header: 1\r\n\r\n')
+        self.assertIsInstance(p.get_error(), httptools.HttpParserError)
+        self.assertEqual(p.get_error_pos(), pos)
+
+        p = httptools.HttpRequestParser(None)
+        status, errno, pos, consumed = p.feed_data_status(
+            memoryview(UPGRADE_REQUEST1))
+        self.assertEqual(status, httptools.FEED_UPGRADE)
+        self.assertEqual(UPGRADE_REQUEST1[consumed:], b'Hot diggity dogg')
+        self.assertIsNone(p.get_error())
+
+    def test_parser_request_feed_data_status_callback_error(self):
+        class Error(Exception):
+            pass
+        m = mock.Mock()
+        m.on_url.side_effect = Error()
+        p = httptools.HttpRequestParser(m)
+
+        status, *_ = p.feed_data_status(UPGRADE_REQUEST1)
+        self.assertEqual(status, httptools.FEED_ERROR)
+        ex = p.get_error()
+        self.assertIsInstance(ex, httptools.HttpParserCallbackError)
+        self.assertIsInstance(ex.__context__, Error)
+
     def test_parser_request_fragmented(self):
         m = mock.Mock()
         headers = {}
@@ -614,6 +883,726 @@ class TestRequestParser(unittest.TestCase):
             {b'Host': b'localhost:1234',
              b'Content-Type': b'text/plain; charset=utf-8'})
 
+    def test_parser_request_fragmented_large_header(self):
+        m = mock.Mock()
+        headers = []
+        m.on_header.side_effect = lambda n, v: headers.append((n, v))
+        p = httptools.HttpRequestParser(m)
+
+        cookie = b'a=' + b'x' * 10000
+        req = (b'GET / HTTP/1.1\r\nCookie: ' + cookie +
+               b'\r\nX-Long-' + b'n' * 1000 + b': v\r\n\r\n')
+
+        for _ in range(2):
+            for i in range(0, len(req), 3):
+                p.feed_data(req[i:i + 3])
+
+        self.assertEqual(headers, [
+            (b'Cookie', cookie),
+            (b'X-Long-' + b'n' * 1000, b'v'),
+        ] * 2)
+        self.assertEqual(m.on_message_complete.call_count, 2)
+
+
+class TestFeedFile(unittest.TestCase):
+
+    def write_file(self, data):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.unlink, path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_feed_file_1(self):
+        m = mock.Mock()
+        headers = {}
+        m.on_header.side_effect = headers.__setitem__
+        p = httptools.HttpResponseParser(m)
+
+        path = self.write_file(RESPONSE1_HEAD + RESPONSE1_BODY)
+        offset = p.feed_file(path, stride=7)
+
+        self.assertEqual(offset, len(RESPONSE1_HEAD + RESPONSE1_BODY))
+        self.assertEqual(p.get_status_code(), 200)
+        self.assertEqual(len(headers), 8)
+        self.assertEqual(
+            b''.join(c.args[0] for c in m.on_body.call_args_list),
+            RESPONSE1_BODY)
+        m.on_message_complete.assert_called_once_with()
+
+    def test_feed_file_resume(self):
+        m = mock.Mock()
+        p = httptools.HttpRequestParser(m)
+
+        path = self.write_file(CHUNKED_REQUEST1_1)
+        offset = p.feed_file(path)
+        self.assertEqual(offset, len(CHUNKED_REQUEST1_1))
+        self.assertFalse(m.on_message_complete.called)
+
+        with open(path, 'ab') as f:
+            f.write(CHUNKED_REQUEST1_2)
+
+        fd = os.open(path, os.O_RDONLY)
+        self.addCleanup(os.close, fd)
+        offset = p.feed_file(fd, offset)
+        self.assertEqual(offset,
+                         len(CHUNKED_REQUEST1_1 + CHUNKED_REQUEST1_2))
+        m.on_message_complete.assert_called_once_with()
+
+        self.assertEqual(p.feed_file(fd, offset), offset)
+        with self.assertRaises(ValueError):
+            p.feed_file(fd, offset + 1)
+
+    def test_feed_file_upgrade(self):
+        p = httptools.HttpRequestParser(None)
+
+        path = self.write_file(UPGRADE_REQUEST1)
+        try:
+            p.feed_file(path, stride=10)
+        except httptools.HttpParserUpgrade as ex:
+            offset = ex.args[0]
+        else:
+            self.fail('HttpParserUpgrade was not raised')
+
+        self.assertEqual(UPGRADE_REQUEST1[offset:], b'Hot diggity dogg')
+
+    def test_feed_file_spans(self):
+        events = []
+
+        class Protocol:
+            def on_url(self, url):
+                events.append(('url', url))
+
+            def on_url_span(self, offset, length):
+                events.append(('url', data[offset:offset + length]))
+
+            def on_header_span(self, name_off, name_len, value_off,
+                               value_len):
+                events.append(('header',
+                               data[name_off:name_off + name_len],
+                               data[value_off:value_off + value_len]))
+
+            def on_body_span(self, offset, length):
+                events.append(('body', data[offset:offset + length]))
+
+            def on_chunk_complete(self):
+                events.append(('chunk',))
+
+            def on_message_complete(self):
+                events.append(('complete',))
+
+            def on_message_span(self, offset, length):
+                events.append(('message', offset, length))
+
+        first = (b'POST /upload?a=b HTTP/1.1\r\n'
+                 b'Host: example.com\r\n'
+                 b'Content-Length: 30\r\n'
+                 b'\r\n' + b'x' * 30)
+        data = first + CHUNKED_REQUEST1_1 + CHUNKED_REQUEST1_2
+        path = self.write_file(data)
+
+        for stride in (1, 7, len(data)):
+            del events[:]
+            p = httptools.HttpRequestParser(Protocol())
+            self.assertEqual(p.feed_file(path, stride=stride, spans=True),
+                             len(data))
+
+            self.assertEqual(events, [
+                ('url', b'/upload?a=b'),
+                ('header', b'Host', b'example.com'),
+                ('header', b'Content-Length', b'30'),
+                ('body', b'x' * 30),
+                ('complete',),
+                ('message', 0, len(first)),
+                ('url', b'/test.php?a=b+c'),
+                ('header', b'User-Agent', b'Fooo'),
+                ('header', b'Host', b'bar'),
+                ('header', b'Transfer-Encoding', b'chunked'),
+                ('body', b'hello'),
+                ('chunk',),
+                ('body', b' world'),
+                ('chunk',),
+                ('header', b'Vary', b'*'),
+                ('header', b'User-Agent', b'spam'),
+                ('chunk',),
+                ('complete',),
+                ('message', len(first), len(data) - len(first)),
+            ])
+
+        # Without spans=True the usual callbacks are used.
+        del events[:]
+        p = httptools.HttpRequestParser(Protocol())
+        p.feed_file(path)
+        self.assertEqual(events[0], ('url', b'/upload?a=b'))
+        self.assertNotIn(('message', 0, len(first)), events)
+
+    def test_feed_file_spans_resume(self):
+        spans = []
+
+        class Protocol:
+            def on_body_span(self, offset, length):
+                spans.append(('body', offset, length))
+
+            def on_message_span(self, offset, length):
+                spans.append(('message', offset, length))
+
+        head = (b'HTTP/1.1 200 OK\r\n'
+                b'Content-Length: 10\r\n'
+                b'\r\n')
+        path = self.write_file(head + b'01234')
+
+        p = httptools.HttpResponseParser(Protocol())
+        offset = p.feed_file(path, spans=True)
+        self.assertEqual(spans, [('body', len(head), 5)])
+
+        with open(path, 'ab') as f:
+            f.write(b'56789')
+        p.feed_file(path, offset, spans=True)
+        self.assertEqual(spans, [
+            ('body', len(head), 5),
+            ('body', len(head) + 5, 5),
+            ('message', 0, len(head) + 10),
+        ])
+
+
+class TestRequestHeadParser(unittest.TestCase):
+
+    def test_parse_request_head_1(self):
+        head = httptools.parse_request_head(
+            CHUNKED_REQUEST1_1, [b'host', b'TRANSFER-encoding'])
+
+        self.assertEqual(head.method, b'POST')
+        self.assertEqual(head.url, b'/test.php?a=b+c')
+        self.assertEqual(head.http_version, '1.1')
+        self.assertEqual(head.headers, {
+            b'host': b'bar',
+            b'transfer-encoding': b'chunked'})
+        self.assertEqual(CHUNKED_REQUEST1_1[head.body_offset:],
+                         b'5\r\nhello\r\n6\r\n world\r\n')
+
+    def test_parse_request_head_2(self):
+        head = httptools.parse_request_head(
+            memoryview(UPGRADE_REQUEST1))
+
+        self.assertEqual(head.method, b'GET')
+        self.assertEqual(head.url, b'/demo')
+        self.assertEqual(head.headers, {})
+        self.assertEqual(UPGRADE_REQUEST1[head.body_offset:],
+                         b'Hot diggity dogg')
+
+    def test_parse_request_head_repeated_header(self):
+        head = httptools.parse_request_head(
+            b'GET / HTTP/1.1\r\nX-A: 1\r\nx-a: 2\r\n\r\n', [b'x-a'])
+        self.assertEqual(head.headers, {b'x-a': b'1, 2'})
+
+    def test_parse_request_head_incomplete(self):
+        with self.assertRaises(httptools.HttpParserIncomplete):
+            httptools.parse_request_head(b'GET / HTTP/1.1\r\nHost: a\r\n')
+
+    def test_parse_request_head_error(self):
+        with self.assertRaises(httptools.HttpParserInvalidMethodError):
+            httptools.parse_request_head(b'SPAM / HTTP/1.1\r\n\r\n')
+
+    def test_parse_request_head_framing(self):
+        # The head is rejected exactly when HttpRequestParser rejects
+        # the framing of the body.
+        for data in (
+            b'POST / HTTP/1.1\r\nTransfer-Encoding: gzip\r\n\r\nabc',
+            b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked, gzip\r\n\r\n',
+            b'POST / HTTP/1.1\r\nTransfer-Encoding: chunked\r\n'
+            b'Content-Length: 3\r\n\r\nabc',
+            b'POST / HTTP/1.1\r\nContent-Length: 1\r\n'
+            b'Content-Length: 2\r\n\r\nab',
+        ):
+            with self.subTest(data=data):
+                with self.assertRaises(httptools.HttpParserError):
+                    httptools.HttpRequestParser(None).feed_data(data)
+                with self.assertRaises(httptools.HttpParserError):
+                    httptools.parse_request_head(data)
+
+        for data, body in (
+            (b'POST / HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc', b'abc'),
+            (b'POST / HTTP/1.1\r\nContent-Length: 3\r\n\r\n', b''),
+            (b'POST / HTTP/1.1\r\nTransfer-Encoding: gzip, chunked\r\n'
+             b'\r\n3\r\nabc\r\n', b'3\r\nabc\r\n'),
+            (b'GET / HTTP/1.1\r\n\r\nGET / HTTP/1.1\r\n\r\n',
+             b'GET / HTTP/1.1\r\n\r\n'),
+        ):
+            with self.subTest(data=data):
+                head = httptools.parse_request_head(data)
+                self.assertEqual(data[head.body_offset:], body)
+
+
+class TestHeaderParsers(unittest.TestCase):
+
+    def test_parse_cookie(self):
+        self.assertEqual(
+            httptools.parse_cookie(
+                b'a=1; b="two words";c=; =x; flag; a=shadowed ;d = 4 '),
+            {b'a': b'1', b'b': b'two words', b'c': b'', b'd': b'4'})
+        self.assertEqual(httptools.parse_cookie(b''), {})
+
+    def test_parse_content_type(self):
+        self.assertEqual(
+            httptools.parse_content_type(
+                b'Multipart/Form-Data; Boundary="a\\\"b;c" ; charset=utf-8'),
+            (b'multipart/form-data',
+             {b'boundary': b'a"b;c', b'charset': b'utf-8'}))
+        self.assertEqual(
+            httptools.parse_content_type(b'text/plain'),
+            (b'text/plain', {}))
+
+        with self.assertRaises(httptools.HttpParserInvalidHeaderError):
+            httptools.parse_content_type(b'; charset=utf-8')
+
+    def test_parse_accept(self):
+        self.assertEqual(
+            httptools.parse_accept(
+                b'text/html;level=1, text/*;q=0.3, */*;q=0.01,'
+                b' application/json , image/png;q=1.5, text/plain;q=0.3'),
+            [(b'text/html;level=1', 1.0),
+             (b'application/json', 1.0),
+             (b'text/*', 0.3),
+             (b'text/plain', 0.3),
+             (b'*/*', 0.01)])
+        self.assertEqual(
+            httptools.parse_accept(b'gzip;q=0, br ;q=0.5;ext=1'),
+            [(b'br', 0.5), (b'gzip', 0.0)])
+        self.assertEqual(
+            httptools.parse_accept(b'a;, b ; ;level=1;, c;;q=0.5'),
+            [(b'a', 1.0), (b'b;level=1', 1.0), (b'c', 0.5)])
+        self.assertEqual(httptools.parse_accept(b''), [])
+
+    def test_parse_host(self):
+        self.assertEqual(httptools.parse_host(b'example.com'),
+                         (b'example.com', None))
+        self.assertEqual(httptools.parse_host(b'example.com:8080'),
+                         (b'example.com', 8080))
+        self.assertEqual(httptools.parse_host(b'[::1]:80'), (b'::1', 80))
+        self.assertEqual(httptools.parse_host(b'[::1]'), (b'::1', None))
+        self.assertEqual(httptools.parse_host(b'a:'), (b'a', None))
+        # An empty Host is valid (RFC 9112, section 3.2).
+        self.assertEqual(httptools.parse_host(b''), (b'', None))
+        self.assertEqual(httptools.parse_host(b' '), (b'', None))
+
+        for host in (b'a:b', b'a:65536', b'[::1', b'[::1]x'):
+            with self.assertRaises(httptools.HttpParserInvalidHeaderError):
+                httptools.parse_host(host)
+
+    def test_request_head_accessors(self):
+        head = httptools.parse_request_head(
+            b'POST / HTTP/1.1\r\nHost: a:81\r\nCookie: x=1\r\n'
+            b'Cookie: y=2\r\nContent-Type: text/plain\r\n\r\n',
+            [b'host', b'cookie', b'content-type', b'accept'])
+
+        self.assertEqual(head.get_host(), (b'a', 81))
+        self.assertEqual(head.get_cookies(), {b'x': b'1', b'y': b'2'})
+        self.assertIs(head.get_cookies(), head.get_cookies())
+        self.assertEqual(head.get_content_type(), (b'text/plain', {}))
+        self.assertIsNone(head.get_accept())
+
+        head = httptools.parse_request_head(
+            b'GET / HTTP/1.1\r\nHost:\r\n\r\n', [b'host'])
+        self.assertEqual(head.get_host(), (b'', None))
+
+
+class TestRouter(unittest.TestCase):
+
+    ROUTES = [
+        b'/',
+        b'/users',
+        b'/users/{id}',
+        b'/users/me',
+        b'/users/{id}/posts/{post}',
+        b'/static/{path*}',
+        b'/{page}',
+        b'/users/{name}/avatar',
+    ]
+
+    def match(self, path):
+        router = httptools.Router(self.ROUTES)
+        m = router.match(path)
+        if m is None:
+            return None
+        route_id, captures = m
+        return route_id, [path[start:end] for start, end in captures]
+
+    def test_router_match(self):
+        self.assertEqual(self.match(b'/'), (0, []))
+        self.assertEqual(self.match(b'/users'), (1, []))
+        self.assertEqual(self.match(b'/users/42'), (2, [b'42']))
+        self.assertEqual(self.match(b'/users/me'), (3, []))
+        self.assertEqual(self.match(b'/users/mex'), (2, [b'mex']))
+        self.assertEqual(self.match(b'/users/me/posts/7'),
+                         (4, [b'me', b'7']))
+        self.assertEqual(self.match(b'/users/me/avatar'), (7, [b'me']))
+        self.assertEqual(self.match(b'/static/'), (5, [b'']))
+        self.assertEqual(self.match(b'/static/css/a.css'),
+                         (5, [b'css/a.css']))
+        self.assertEqual(self.match(b'/about'), (6, [b'about']))
+
+        self.assertIsNone(self.match(b'/users/'))
+        self.assertIsNone(self.match(b'/users//posts/1'))
+        self.assertIsNone(self.match(b'/users/1/posts'))
+        self.assertIsNone(self.match(b''))
+
+    def test_router_match_url(self):
+        router = httptools.Router(self.ROUTES)
+        self.assertEqual(router.param_names(4), (b'id', b'post'))
+
+        url = b'/users/42/posts/7?x=/users/1#f'
+        self.assertEqual(router.match_url(url), (4, ((7, 9), (16, 17))))
+        self.assertEqual(router.match_url(memoryview(url)),
+                         router.match(url[:17]))
+
+        url = b'http://example.com:80/users/42?q'
+        route_id, ((start, end),) = router.match_url(url)
+        self.assertEqual((route_id, url[start:end]), (2, b'42'))
+
+        self.assertIsNone(router.match_url(b'*'))
+        self.assertIsNone(router.match_url(b'example.com:443'))
+
+        # An empty path is "/" (RFC 3986, section 6.2.3).
+        self.assertEqual(router.match_url(b'http://h'), (0, ()))
+        self.assertEqual(router.match_url(b'http://h?x=1'), (0, ()))
+        self.assertEqual(router.match_url(b'http://example.com#f'), (0, ()))
+
+        router = httptools.Router([b'/{path*}'])
+        self.assertEqual(router.match_url(b'http://h?x=1'), (0, ((8, 8),)))
+
+    def test_router_errors(self):
+        for routes in ([b'/a/{x'], [b'/a{x}'], [b'/{x}a'],
+                       [b'/{x*}/a'], [b'/{}'], [b'/{x}/{x}'],
+                       [b'/a', b'/a'], [b'/{x}', b'/{y}']):
+            with self.assertRaises(ValueError):
+                httptools.Router(routes)
+
+
+MULTIPART_BODY = (
+    b'--b0undary\r\n'
+    b'Content-Disposition: form-data; name="field"\r\n'
+    b'\r\n'
+    b'value\r\n'
+    b'--b0undary\r\n'
+    b'Content-Disposition: form-data; name="file"; filename="a.txt"\r\n'
+    b'Content-Type: text/plain\r\n'
+    b'\r\n'
+    b'line 1\r\n--b0und\r\nline 2\r\n'
+    b'--b0undary--\r\n'
+)
+
+
+class MultipartRecorder:
+
+    def __init__(self):
+        self.parts = []
+
+    def on_part_begin(self):
+        self.parts.append(([], []))
+
+    def on_part_header(self, name, value):
+        self.parts[-1][0].append((name, value))
+
+    def on_part_data(self, data):
+        self.parts[-1][1].append(bytes(data))
+
+    def on_part_end(self):
+        self.parts[-1][1][:] = [b''.join(self.parts[-1][1])]
+
+
+class TestMultipartParser(unittest.TestCase):
+
+    EXPECTED = [
+        ([(b'Content-Disposition', b'form-data; name="field"')],
+         [b'value']),
+        ([(b'Content-Disposition',
+           b'form-data; name="file"; filename="a.txt"'),
+          (b'Content-Type', b'text/plain')],
+         [b'line 1\r\n--b0und\r\nline 2']),
+    ]
+
+    def test_multipart_1(self):
+        for step in (1, 3, 7, len(MULTIPART_BODY)):
+            for zero_copy in (False, True):
+                m = MultipartRecorder()
+                p = httptools.MultipartParser(b'b0undary', m,
+                                              zero_copy=zero_copy)
+                for i in range(0, len(MULTIPART_BODY), step):
+                    p.feed_data(MULTIPART_BODY[i:i + step])
+                p.finish()
+
+                self.assertTrue(p.is_complete())
+                self.assertEqual(m.parts, self.EXPECTED)
+
+    def test_multipart_zero_copy_released(self):
+        views = []
+        m = mock.Mock()
+        m.on_part_data.side_effect = views.append
+        p = httptools.MultipartParser(b'b0undary', m, zero_copy=True)
+        p.feed_data(MULTIPART_BODY)
+
+        self.assertTrue(views)
+        with self.assertRaises(ValueError):
+            bytes(views[0])
+
+    def test_multipart_part_fd(self):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.unlink, path)
+        self.addCleanup(os.close, fd)
+
+        m = mock.Mock()
+        p = httptools.MultipartParser(b'b0undary', m)
+        m.on_part_headers_complete.side_effect = \
+            lambda: p.set_part_fd(fd) if m.on_part_begin.call_count == 2 \
+            else None
+
+        for i in range(0, len(MULTIPART_BODY), 5):
+            p.feed_data(MULTIPART_BODY[i:i + 5])
+
+        m.on_part_data.assert_called_with(b'value')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'line 1\r\n--b0und\r\nline 2')
+
+    def test_multipart_errors(self):
+        p = httptools.MultipartParser(b'b0undary', None)
+        p.feed_data(MULTIPART_BODY[:-4])
+        with self.assertRaises(httptools.HttpParserMultipartError):
+            p.finish()
+
+        p = httptools.MultipartParser(b'b0undary', None)
+        with self.assertRaises(httptools.HttpParserMultipartError):
+            p.feed_data(b'--b0undary\r\nno colon\r\n\r\n')
+
+        with self.assertRaises(ValueError):
+            httptools.MultipartParser(b'', None)
+
+    def test_multipart_request(self):
+        m = mock.Mock()
+        parts = MultipartRecorder()
+        p = httptools.HttpRequestParser(m)
+        p.enable_multipart(parts)
+
+        req = (b'POST /upload HTTP/1.1\r\n'
+               b'Content-Type: multipart/form-data; boundary="b0undary"\r\n'
+               b'Content-Length: ' + str(len(MULTIPART_BODY)).encode() +
+               b'\r\n\r\n' + MULTIPART_BODY)
+        for i in range(0, len(req), 10):
+            p.feed_data(req[i:i + 10])
+
+        self.assertEqual(parts.parts, self.EXPECTED)
+        self.assertFalse(m.on_body.called)
+        m.on_message_complete.assert_called_once_with()
+
+        # Other bodies still go to on_body.
+        p.feed_data(b'POST / HTTP/1.1\r\nContent-Length: 2\r\n\r\nhi')
+        m.on_body.assert_called_once_with(b'hi')
+
+        with self.assertRaises(httptools.HttpParserMultipartError):
+            p.feed_data(req[:-10].replace(
+                str(len(MULTIPART_BODY)).encode(),
+                str(len(MULTIPART_BODY) - 10).encode()))
+
+    def test_multipart_request_part_fd(self):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.unlink, path)
+        self.addCleanup(os.close, fd)
+
+        m = mock.Mock()
+        parts = mock.Mock()
+        p = httptools.HttpRequestParser(m)
+        p.enable_multipart(parts)
+        parts.on_part_headers_complete.side_effect = \
+            lambda: p.get_multipart().set_part_fd(fd) \
+            if parts.on_part_begin.call_count == 2 else None
+
+        self.assertIsNone(p.get_multipart())
+        p.feed_data(b'POST /upload HTTP/1.1\r\n'
+                    b'Content-Type: multipart/form-data; boundary=b0undary\r\n'
+                    b'Content-Length: ' + str(len(MULTIPART_BODY)).encode() +
+                    b'\r\n\r\n')
+        self.assertIsInstance(p.get_multipart(), httptools.MultipartParser)
+        for i in range(0, len(MULTIPART_BODY), 5):
+            p.feed_data(MULTIPART_BODY[i:i + 5])
+
+        self.assertIsNone(p.get_multipart())
+        m.on_message_complete.assert_called_once_with()
+        parts.on_part_data.assert_called_with(b'value')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'line 1\r\n--b0und\r\nline 2')
+
+
+class WebSocketRecorder:
+
+    def __init__(self):
+        self.events = []
+
+    def on_ws_message_begin(self, opcode):
+        self.events.append(('begin', opcode))
+
+    def on_ws_message_data(self, data):
+        self.events.append(('data', data))
+
+    def on_ws_message_complete(self):
+        self.events.append(('complete',))
+
+    def on_ws_control_frame(self, opcode, payload):
+        self.events.append(('control', opcode, payload))
+
+
+class TestWebSocketFrameParser(unittest.TestCase):
+
+    def test_websocket_after_upgrade(self):
+        # Example from RFC 6455, section 5.7.
+        data = UPGRADE_REQUEST1[:-16] + \
+            b'\x81\x85\x37\xfa\x21\x3d\x7f\x9f\x4d\x51\x58'
+
+        p = httptools.HttpRequestParser(None)
+        try:
+            p.feed_data(data)
+        except httptools.HttpParserUpgrade as ex:
+            offset = ex.args[0]
+        else:
+            self.fail('HttpParserUpgrade was not raised')
+
+        m = WebSocketRecorder()
+        ws = httptools.WebSocketFrameParser(m)
+        ws.feed_data(memoryview(data)[offset:])
+
+        self.assertEqual(m.events, [
+            ('begin', websocket.OP_TEXT),
+            ('data', b'Hello'),
+            ('complete',),
+        ])
+
+    def test_websocket_fragmented(self):
+        payload = bytes(range(256)) * 300
+        data = (
+            websocket.build_frame(websocket.OP_BINARY, payload[:1001],
+                                  fin=False, mask=b'abcd') +
+            websocket.build_frame(websocket.OP_PING, b'ping',
+                                  mask=b'efgh') +
+            websocket.build_frame(websocket.OP_CONTINUATION, payload[1001:],
+                                  mask=b'ijkl') +
+            websocket.build_frame(websocket.OP_CLOSE, b'\x03\xe8',
+                                  mask=b'mnop')
+        )
+
+        for step in (1, 5, 4096, len(data)):
+            m = WebSocketRecorder()
+            ws = httptools.WebSocketFrameParser(m)
+            for i in range(0, len(data), step):
+                ws.feed_data(data[i:i + step])
+
+            self.assertEqual(m.events[0], ('begin', websocket.OP_BINARY))
+            self.assertIn(('control', websocket.OP_PING, b'ping'), m.events)
+            self.assertEqual(m.events[-2:], [
+                ('complete',),
+                ('control', websocket.OP_CLOSE, b'\x03\xe8'),
+            ])
+            self.assertEqual(
+                b''.join(e[1] for e in m.events if e[0] == 'data'), payload)
+
+    def test_websocket_client_side(self):
+        m = WebSocketRecorder()
+        ws = httptools.WebSocketFrameParser(m, server_side=False)
+        ws.feed_data(websocket.build_frame(websocket.OP_TEXT, b'x' * 200))
+        self.assertEqual(m.events, [
+            ('begin', websocket.OP_TEXT),
+            ('data', b'x' * 200),
+            ('complete',),
+        ])
+
+        with self.assertRaises(httptools.HttpParserWebSocketError):
+            ws.feed_data(websocket.build_frame(websocket.OP_TEXT, b'x',
+                                               mask=b'abcd'))
+
+    def test_websocket_errors(self):
+        def check(data, **kwargs):
+            ws = httptools.WebSocketFrameParser(None, **kwargs)
+            with self.assertRaises(httptools.HttpParserWebSocketError):
+                ws.feed_data(data)
+
+        # Unmasked client frame.
+        check(websocket.build_frame(websocket.OP_TEXT, b'x'))
+        # Reserved bits and opcodes.
+        check(b'\xc1\x80abcd')
+        check(b'\x83\x80abcd')
+        # Fragmented control frame.
+        check(websocket.build_frame(websocket.OP_TEXT, b'', mask=b'abcd')
+              .replace(b'\x81', b'\x09', 1))
+        # Continuation without a message.
+        check(websocket.build_frame(websocket.OP_CONTINUATION, b'x',
+                                    mask=b'abcd'))
+        # Message too large.
+        check(websocket.build_frame(websocket.OP_BINARY, b'x' * 100,
+                                    mask=b'abcd'),
+              max_message_size=99)
+
+        with self.assertRaises(ValueError):
+            websocket.build_frame(websocket.OP_PING, b'x' * 126)
+
+    def test_websocket_text_utf8(self):
+        text = 'zürich €10 \U0001f600'.encode()
+        # Split inside the 4-byte sequence at the end.
+        data = (
+            websocket.build_frame(websocket.OP_TEXT, text[:-2], fin=False,
+                                  mask=b'abcd') +
+            websocket.build_frame(websocket.OP_CONTINUATION, text[-2:],
+                                  mask=b'efgh')
+        )
+
+        for step in (1, 3, len(data)):
+            m = WebSocketRecorder()
+            ws = httptools.WebSocketFrameParser(m)
+            for i in range(0, len(data), step):
+                ws.feed_data(data[i:i + step])
+            self.assertEqual(
+                b''.join(e[1] for e in m.events if e[0] == 'data'), text)
+            self.assertEqual(m.events[-1], ('complete',))
+
+        # Binary messages are not checked.
+        ws = httptools.WebSocketFrameParser(None)
+        ws.feed_data(websocket.build_frame(websocket.OP_BINARY, b'\xff',
+                                           mask=b'abcd'))
+
+        for payload in (b'\xff\xfe', b'abcdefgh\xc0\xaf', b'\xed\xa0\x80',
+                        b'\xf4\x90\x80\x80', b'\xe2\x82', b'\x80'):
+            for protocol in (None, WebSocketRecorder()):
+                with self.subTest(payload=payload, protocol=protocol):
+                    ws = httptools.WebSocketFrameParser(protocol)
+                    with self.assertRaises(
+                            httptools.HttpParserWebSocketError):
+                        ws.feed_data(websocket.build_frame(
+                            websocket.OP_TEXT, payload, mask=b'abcd'))
+
+        # A sequence cut short by the final fragment.
+        ws = httptools.WebSocketFrameParser(None)
+        ws.feed_data(websocket.build_frame(websocket.OP_TEXT, b'\xe2',
+                                           fin=False, mask=b'abcd'))
+        with self.assertRaises(httptools.HttpParserWebSocketError):
+            ws.feed_data(websocket.build_frame(websocket.OP_CONTINUATION,
+                                               b'\x82', mask=b'abcd'))
+
+    def test_websocket_close_frame(self):
+        def feed(payload):
+            m = WebSocketRecorder()
+            ws = httptools.WebSocketFrameParser(m)
+            ws.feed_data(websocket.build_frame(websocket.OP_CLOSE, payload,
+                                               mask=b'abcd'))
+            return m.events
+
+        for payload in (b'', b'\x03\xe8', b'\x0f\xa0bye',
+                        b'\x03\xf3' + 'ü'.encode()):
+            self.assertEqual(feed(payload),
+                             [('control', websocket.OP_CLOSE, payload)])
+
+        for payload in (b'\x03', b'\x03\xe7', b'\x03\xed', b'\x03\xee',
+                        b'\x03\xf7', b'\x07\xd0', b'\x13\x88',
+                        b'\x03\xe8\xff'):
+            with self.subTest(payload=payload):
+                with self.assertRaises(httptools.HttpParserWebSocketError):
+                    feed(payload)
+
 
 class TestUrlParser(unittest.TestCase):
 
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from httptools import replay
+
+
+REQUESTS = (
+    b'GET /a HTTP/1.1\r\nHost: x\r\n\r\n'
+    b'POST /b HTTP/1.1\r\nHost: x\r\nContent-Length: 5\r\n\r\nhello'
+)
+
+RESPONSES = (
+    b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok'
+    b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n'
+    b'\r\n'
+)
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, data):
+        with open(os.path.join(self.tmp.name, name), 'wb') as f:
+            f.write(data)
+
+    def test_replay_requests(self):
+        self.write('0', REQUESTS)
+        self.write('1', b'GET / HTTP/1.1\r\n\r\nSPAM / HTTP/1.1\r\n\r\n')
+        self.write('2', b'')
+
+        for processes in (0, 2):
+            res = replay.replay(self.tmp.name, processes=processes)
+
+            self.assertEqual(len(res), 3)
+            self.assertEqual(list(res.stream), [0, 0, 1])
+            self.assertEqual([res.methods[c] for c in res.code],
+                             [b'GET', b'POST', b'GET'])
+            self.assertEqual(list(res.header_count), [1, 2, 0])
+            self.assertEqual(list(res.body_size), [0, 5, 0])
+            self.assertEqual(list(res.stream_size),
+                             [len(REQUESTS), 37, 0])
+            self.assertEqual(list(res.start), [0, 28, 0])
+            self.assertEqual(list(res.end), [28, len(REQUESTS), 18])
+            self.assertEqual(list(res.errors), [1])
+            self.assertIn('HttpParserInvalidMethodError', res.errors[1])
+            self.assertEqual(list(res.error_offset), [-1, 19, -1])
+
+    def test_replay_responses(self):
+        self.write('0', RESPONSES)
+
+        res = replay.replay(self.tmp.name, response=True, processes=0)
+
+        self.assertEqual(list(res.code), [200, 404])
+        self.assertEqual(list(res.body_size), [2, 0])
+        self.assertEqual(list(res.keep_alive), [1, 0])
+        self.assertEqual(res.errors, {})
+        self.assertEqual(list(res.start), [0, 40])
+        self.assertEqual(list(res.end), [40, len(RESPONSES)])
+
+    def test_replay_eof(self):
+        self.write('0', b'HTTP/1.1 200 OK\r\nConnection: close\r\n\r\n'
+                        b'hello world')
+        self.write('1', b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n'
+                        b'abc')
+
+        res = replay.replay(self.tmp.name, response=True, processes=0)
+
+        self.assertEqual(list(res.stream), [0])
+        self.assertEqual(list(res.body_size), [11])
+        self.assertEqual(list(res.end), [res.stream_size[0]])
+        self.assertEqual(list(res.errors), [1])
+        self.assertIn('incomplete message', res.errors[1])
+        self.assertEqual(list(res.error_offset), [-1, res.stream_size[1]])
+
+    def test_replay_truncated_request(self):
+        self.write('0', b'POST / HTTP/1.1\r\nContent-Length: 10\r\n\r\nabc')
+
+        res = replay.replay(self.tmp.name, processes=0)
+
+        self.assertEqual(len(res), 0)
+        self.assertIn('incomplete message', res.errors[0])